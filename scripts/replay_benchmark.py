@@ -0,0 +1,351 @@
+"""Replays recorded audio through the transcription server and writes a JSON benchmark report.
+
+The fixture is a JSON file listing the bullet points and the cases to replay:
+
+    {
+        "bullets": ["First bullet", "Second bullet"],
+        "cases": [
+            {
+                "audio": "intro.wav",
+                "reference": "what the speaker actually said",
+                "expected_bullets": ["First bullet"]
+            }
+        ]
+    }
+
+Paths are relative to the fixture file. "reference_file" may replace
+"reference", and "expected_bullets" may hold bullet texts or indexes.
+Audio is a WAV file (16-bit PCM, any rate, mono or stereo) or raw 16 kHz
+mono int16 .pcm. Each case runs on its own websocket connection, streamed in
+frame_ms frames at --speed times real time.
+
+A server started without --spawn needs --no-microphone, or the host's live
+microphone is transcribed along with the replayed audio.
+"""
+import sys
+import os
+import asyncio
+import websockets
+import json
+import argparse
+import time
+import re
+import subprocess
+import wave
+import numpy as np
+from datetime import datetime
+
+try:
+    import psutil
+except ImportError:
+    psutil = None  # CPU and RSS are reported as null without it
+
+SERVER_URL = "ws://127.0.0.1:9876"
+RECORDER_SAMPLE_RATE = 16000  # Rate the server's recorder consumes; other rates are announced with audio_format
+FRAME_MS = 32  # Audio per binary frame; 512 samples at 16 kHz, one RealtimeSTT chunk
+TRAILING_SILENCE = 1.5  # Seconds of silence streamed after each case so the last words stabilize
+DRAIN_TIMEOUT = 5.0  # Seconds to keep listening for late messages after the audio ends
+READY_TIMEOUT = 300.0  # Seconds to wait for the server's models to load
+RESOURCE_SAMPLE_INTERVAL = 0.25  # Seconds between CPU/RSS samples of the server process
+UTTERANCE_OPENING_WORDS = 2  # Leading words that tell a revised utterance from the next one
+
+def load_audio(path):
+    """Returns (int16 mono samples, sample rate) for a WAV or raw 16 kHz .pcm file."""
+    if path.lower().endswith(".pcm"):
+        return np.fromfile(path, dtype="<i2"), RECORDER_SAMPLE_RATE
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+        channels = wav.getnchannels()
+        rate = wav.getframerate()
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2")
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return samples, rate
+
+def normalize_words(text):
+    """Lowercases and strips punctuation so WER compares words only."""
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+def same_utterance(previous, text):
+    """True if text revises or extends previous rather than starting the next utterance.
+
+    Realtime text restarts with every utterance, so the opening words only
+    change when a new one begins. The last word of previous may still have
+    been growing ("wor" -> "world").
+    """
+    old, new = normalize_words(previous), normalize_words(text)
+    needed = min(len(old), len(new), UTTERANCE_OPENING_WORDS)
+    for i in range(needed):
+        partial = i == len(old) - 1 and new[i].startswith(old[i])
+        if old[i] != new[i] and not partial:
+            return False
+    return needed > 0
+
+def word_error_rate(reference, hypothesis):
+    """Word-level Levenshtein distance divided by the reference length."""
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(
+                previous[j] + 1,  # Deletion
+                current[j - 1] + 1,  # Insertion
+                previous[j - 1] + (ref_word != hyp_word),  # Substitution
+            )
+        previous = current
+    return previous[-1] / len(ref)
+
+def percentiles(values):
+    """Summarizes latencies in milliseconds."""
+    if not values:
+        return None
+    ms = np.asarray(values) * 1000
+    return {
+        "count": len(values),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "max_ms": float(ms.max()),
+    }
+
+class ResourceSampler:
+    """Samples CPU time and RSS of the server process while a case runs."""
+
+    def __init__(self, pid):
+        self.process = psutil.Process(pid) if psutil and pid else None
+        self.peak_rss = 0
+        self.task = None
+
+    async def _sample(self):
+        while True:
+            self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+            await asyncio.sleep(RESOURCE_SAMPLE_INTERVAL)
+
+    def start(self):
+        if self.process is None:
+            return
+        self.cpu_start = sum(self.process.cpu_times()[:2])
+        self.wall_start = time.perf_counter()
+        self.task = asyncio.create_task(self._sample())
+
+    def stop(self):
+        """Returns CPU utilization (1.0 = one core) and peak RSS, or None without psutil."""
+        if self.task is None:
+            return None
+        self.task.cancel()
+        cpu = sum(self.process.cpu_times()[:2]) - self.cpu_start
+        wall = time.perf_counter() - self.wall_start
+        return {
+            "cpu_seconds": cpu,
+            "cpu_utilization": cpu / wall if wall else 0.0,
+            "peak_rss_mb": self.peak_rss / (1024 * 1024),
+        }
+
+async def wait_until_ready(url):
+    """Connects until the server accepts and both of its models report ready."""
+    deadline = time.monotonic() + READY_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            async with websockets.connect(url, max_size=None) as websocket:
+                components = {}
+                while True:
+                    message = json.loads(await asyncio.wait_for(websocket.recv(), deadline - time.monotonic()))
+                    if message.get("status") == "connected":
+                        components = message.get("components", {})
+                    elif message.get("component"):
+                        components[message["component"]] = message["status"]
+                    if components and all(status in ("ready", "failed") for status in components.values()):
+                        return components
+        except (OSError, websockets.exceptions.WebSocketException):
+            await asyncio.sleep(0.5)
+    raise TimeoutError(f"Server at {url} was not ready after {READY_TIMEOUT:.0f} s")
+
+async def run_case(url, bullets, case, speed, frame_ms, server_pid):
+    """Streams one case and returns its measurements."""
+    samples, rate = load_audio(case["audio"])
+    frame = max(1, rate * frame_ms // 1000)
+    silence = np.zeros(int(rate * TRAILING_SILENCE), dtype=np.int16)
+    stream = np.concatenate([samples, silence])
+
+    utterances = []  # Last realtime text of each utterance; earlier revisions don't count towards WER
+    transcript_times = []  # Wall time of every transcription message
+    match_latencies = []  # Last transcription -> match_result
+    matched = []
+    last_transcript_at = None
+    stream_start = None
+    stream_end = None
+    server_stats = {}
+
+    async with websockets.connect(url, max_size=None) as websocket:
+        async def receive():
+            nonlocal last_transcript_at
+            async for raw in websocket:
+                message = json.loads(raw)
+                now = time.perf_counter()
+                if message["type"] == "transcription":
+                    if utterances and same_utterance(utterances[-1], message["text"]):
+                        utterances[-1] = message["text"]
+                    else:
+                        utterances.append(message["text"])
+                    transcript_times.append(now)
+                    last_transcript_at = now
+                elif message["type"] == "match_result":
+                    matched.append(message["match"])
+                    if last_transcript_at is not None:
+                        match_latencies.append(now - last_transcript_at)
+                elif message["type"] == "stats":
+                    server_stats.update(message)
+
+        receiver = asyncio.create_task(receive())
+        await websocket.send(json.dumps({"type": "set_bullet_points", "payload": {"points": bullets}}))
+        if rate != RECORDER_SAMPLE_RATE:
+            await websocket.send(json.dumps({"type": "audio_format", "payload": {"sample_rate": rate, "format": "int16"}}))
+        await websocket.send(json.dumps({"type": "control", "payload": {"command": "start"}}))
+
+        resources = ResourceSampler(server_pid)
+        resources.start()
+        stream_start = time.perf_counter()
+        for offset in range(0, len(stream), frame):
+            await websocket.send(stream[offset:offset + frame].tobytes())
+            # Pace against the stream clock so send overhead doesn't accumulate
+            due = stream_start + (offset + frame) / rate / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        stream_end = time.perf_counter()
+        await asyncio.sleep(DRAIN_TIMEOUT)
+        resource_usage = resources.stop()
+
+        await websocket.send(json.dumps({"type": "control", "payload": {"command": "stats"}}))
+        await websocket.send(json.dumps({"type": "control", "payload": {"command": "stop"}}))
+        await asyncio.sleep(0.5)
+        receiver.cancel()
+
+    hypothesis = " ".join(utterances)
+    expected = set(case.get("expected_bullets", []))
+    hits = set(matched) & expected
+    distinct = set(matched)
+    speech_end = stream_start + len(samples) / rate / speed
+    return {
+        "audio": os.path.basename(case["audio"]),
+        "audio_seconds": len(samples) / rate,
+        "stream_seconds": stream_end - stream_start,
+        "transcript": hypothesis,
+        "wer": word_error_rate(case["reference"], hypothesis) if case.get("reference") is not None else None,
+        "transcript_latency": {
+            "first_update_s": transcript_times[0] - stream_start if transcript_times else None,
+            # How long after the speech ended the last words arrived
+            "final_update_after_speech_s": transcript_times[-1] - speech_end if transcript_times else None,
+            "update_interval": percentiles(np.diff(transcript_times).tolist()),
+        },
+        "match_latency": percentiles(match_latencies),
+        "matches": {
+            "results": len(matched),
+            "distinct": sorted(distinct),
+            "precision": len(hits) / len(distinct) if distinct else None,
+            "recall": len(hits) / len(expected) if expected else None,
+        },
+        "resources": resource_usage,
+        "server_latency": server_stats.get("latency"),
+    }
+
+def load_fixture(path):
+    """Reads the fixture and resolves paths, references and expected bullets."""
+    with open(path, encoding="utf-8") as f:
+        fixture = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    bullets = fixture["bullets"]
+    for case in fixture["cases"]:
+        case["audio"] = os.path.join(base, case["audio"])
+        if "reference_file" in case:
+            with open(os.path.join(base, case["reference_file"]), encoding="utf-8") as f:
+                case["reference"] = f.read()
+        case["expected_bullets"] = [
+            bullets[item] if isinstance(item, int) else item for item in case.get("expected_bullets", [])
+        ]
+    return bullets, fixture["cases"]
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, text=True,
+        ).strip()
+    except Exception:
+        return None
+
+def summarize(cases):
+    """Averages the per-case numbers that are comparable between runs."""
+    def mean(values):
+        values = [v for v in values if v is not None]
+        return sum(values) / len(values) if values else None
+    return {
+        "wer": mean(case["wer"] for case in cases),
+        "match_precision": mean(case["matches"]["precision"] for case in cases),
+        "match_recall": mean(case["matches"]["recall"] for case in cases),
+        "first_update_s": mean(case["transcript_latency"]["first_update_s"] for case in cases),
+        "final_update_after_speech_s": mean(case["transcript_latency"]["final_update_after_speech_s"] for case in cases),
+        "match_latency_p50_ms": mean((case["match_latency"] or {}).get("p50_ms") for case in cases),
+        "cpu_utilization": mean((case["resources"] or {}).get("cpu_utilization") for case in cases),
+        "peak_rss_mb": max(((case["resources"] or {}).get("peak_rss_mb") or 0 for case in cases), default=None),
+    }
+
+async def run(args):
+    bullets, cases = load_fixture(args.fixture)
+    server = None
+    server_pid = args.server_pid
+    if args.spawn:
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "transcription.py")
+        # The replayed audio must be the only input, so the host's microphone stays off
+        server = subprocess.Popen([sys.executable, script, "--no-microphone"] + args.server_args)
+        server_pid = server.pid
+    try:
+        components = await wait_until_ready(args.url)
+        print(f"Server ready: {components}")
+        results = []
+        for case in cases:
+            print(f"Replaying {case['audio']} at {args.speed}x...")
+            result = await run_case(args.url, bullets, case, args.speed, args.frame_ms, server_pid)
+            print(f"  WER {result['wer']}, precision {result['matches']['precision']}, recall {result['matches']['recall']}")
+            results.append(result)
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=10)
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "fixture": os.path.abspath(args.fixture),
+        "speed": args.speed,
+        "frame_ms": args.frame_ms,
+        "summary": summarize(results),
+        "cases": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        # Sorted keys keep reports diffable between commits
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Wrote {args.output}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay recorded audio through the transcription server")
+    parser.add_argument("fixture", help="JSON fixture with bullets and cases")
+    parser.add_argument("--output", default="benchmark_report.json", help="Where to write the JSON report")
+    parser.add_argument("--url", default=SERVER_URL, help="Websocket URL of the server")
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed; 1.0 is real time")
+    parser.add_argument("--frame-ms", type=int, default=FRAME_MS, help="Milliseconds of audio per frame")
+    parser.add_argument("--spawn", action="store_true", help="Start transcription.py for the run and stop it afterwards")
+    parser.add_argument("--server-pid", type=int, help="PID of an already running server, for CPU/RSS sampling")
+    parser.add_argument("server_args", nargs=argparse.REMAINDER, help="Arguments passed to a spawned server after --")
+    args = parser.parse_args()
+    if args.server_args[:1] == ["--"]:
+        args.server_args = args.server_args[1:]
+    return args
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
@@ -2,64 +2,248 @@ import sys
 import logging
 import os
 # from install_packages import check_and_install_packages
-from RealtimeSTT import AudioToTextRecorder
 import asyncio
 import websockets
 import json
 import signal
+import atexit
+import argparse
 import sys
 import time
+import hashlib
+import struct
 import queue
+import logging.handlers
+import itertools
+import math
+import platform
+import threading
+import unicodedata
+import wave
+import uuid
+from collections import OrderedDict, deque
 import numpy as np
-from sentence_transformers import SentenceTransformer, util
 import re
 from datetime import datetime
 import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# --- Logging Setup ---
+LOG_LEVEL = os.environ.get('TRANSCRIPTION_LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.environ.get('TRANSCRIPTION_LOG_FORMAT', 'text')  # 'text' or 'json'
+LOG_SAMPLE_EVERY = 100  # Per-frame and per-update messages are logged once every N occurrences
+# Dumps the whole session transcript on every update at DEBUG; O(transcript) per update
+LOG_FULL_TRANSCRIPT = os.environ.get('TRANSCRIPTION_LOG_FULL_TRANSCRIPT') == '1'
+TEXT_LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+# Pass as extra= on messages that can fire per frame or per transcript update
+SAMPLED = {'sample_every': LOG_SAMPLE_EVERY}
+
+logger = logging.getLogger('transcription')
+log_listener = None
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queues records without formatting them; the listener thread formats and writes.
+
+    The stock QueueHandler formats in the calling thread, which is the cost
+    we want off the hot path. Records stay in-process, so their args don't
+    need to be flattened.
+    """
+
+    def prepare(self, record):
+        return record
+
+class SamplingFilter(logging.Filter):
+    """Lets one in `sample_every` records through for messages that set it in extra.
+
+    Each call site is sampled separately; the record that passes carries how
+    many were suppressed since the last one.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.counts = {}
+
+    def filter(self, record):
+        every = getattr(record, 'sample_every', None)
+        if not every or every <= 1:
+            return True
+        key = (record.pathname, record.lineno)
+        count = self.counts.get(key, 0)
+        self.counts[key] = count + 1
+        if count % every:
+            return False
+        record.suppressed = every - 1 if count else 0
+        return True
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)  # Explicitly set to stdout
-    ]
-)
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any fields= extra."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if getattr(record, 'suppressed', 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def setup_logging(level=LOG_LEVEL, log_format=LOG_FORMAT):
+    """Routes every logger through a queue drained by a single writer thread."""
+    global log_listener
+    if log_listener is not None:
+        log_listener.stop()
+    stream = logging.StreamHandler(sys.stdout)  # Explicitly set to stdout
+    stream.setFormatter(JsonFormatter() if log_format == 'json' else logging.Formatter(TEXT_LOG_FORMAT))
+    handler = DeferredQueueHandler(queue.SimpleQueue())
+    handler.addFilter(SamplingFilter())
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    log_listener = logging.handlers.QueueListener(handler.queue, stream)
+    log_listener.start()
+
+def stop_logging():
+    """Writes out queued records and stops the writer thread."""
+    global log_listener
+    if log_listener is not None:
+        log_listener.stop()
+        log_listener = None
+
+setup_logging()
+atexit.register(stop_logging)
 
 # --- Sentence Similarity Setup ---
 MODEL_NAME = 'sentence-transformers/multi-qa-MiniLM-L6-cos-v1'
 SIMILARITY_THRESHOLD = 0.5#5  # Threshold for matching
+TOP_K = 3  # Number of ranked matches sent with each match_result
+# Embedding backend chosen at startup: 'torch', 'onnx' (ONNX Runtime) or 'onnx_int8' (int8-quantized ONNX)
+EMBEDDING_BACKEND = os.environ.get('TRANSCRIPTION_EMBEDDING_BACKEND', 'torch')
+# Dynamically quantized export for this CPU: the ARM build on Apple Silicon and arm64 Linux,
+# otherwise the AVX2 build, which runs on any x86-64 CPU from the last decade
+ONNX_INT8_FILE = (
+    'onnx/model_qint8_arm64.onnx' if platform.machine().lower() in ('arm64', 'aarch64')
+    else 'onnx/model_quint8_avx2.onnx'
+)
+EMBEDDING_BACKENDS = {
+    'torch': {},
+    'onnx': {'backend': 'onnx'},
+    'onnx_int8': {'backend': 'onnx', 'model_kwargs': {'file_name': ONNX_INT8_FILE}},
+}
+EMBEDDING_BATCH_SIZE = 64  # Texts per forward pass when encoding bullet lists
+PARITY_MIN_COSINE = 0.98  # A backend passes the parity check if every sample stays this close to torch
+PARITY_SENTENCES = [
+    "I led the migration of our monolith to microservices on Kubernetes.",
+    "We cut API latency in half by adding a Redis cache in front of Postgres.",
+    "My strongest language is Python, but I have shipped production Go and TypeScript.",
+    "I mentored three junior engineers and ran our weekly design reviews.",
+    "The biggest challenge was debugging a race condition in the payment service.",
+    "I designed the data pipeline that trains our recommendation models every night.",
+    "Tell me about a time you disagreed with your manager.",
+    "I improved test coverage from forty to eighty five percent.",
+    "We used A/B testing to validate the new onboarding flow.",
+    "I'm looking for a team where I can own a product area end to end.",
+]
+INDEX_BACKEND = 'auto'  # 'auto', 'brute_force' or 'ivf'
+ANN_MIN_BULLETS = 2000  # 'auto' switches to the IVF index at this many bullets
+IVF_NPROBE = 8  # Number of IVF lists scanned per query
+RECALL_SAMPLE_INTERVAL = 50  # Check approximate results against exact search every N queries
+EMBEDDING_CACHE_DIR = os.path.join(
+    os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'transcription', 'embeddings'
+)
+EMBEDDING_CACHE_DTYPE = 'float16'  # 'float16' halves the file size; 'float32' is lossless
+EMBEDDING_CACHE_MAX_MB = 64  # Size cap for the memory-mapped embedding file
+BULLET_UPDATE_DEBOUNCE = 0.3  # Seconds of quiet before queued bullet edits are encoded
+COVERAGE_SUPPRESS = True  # Drop matched bullets from the candidates so they don't fire again
+COVERAGE_REARM_SECONDS = 0  # Matched bullets become candidates again after this long; 0 never re-arms
+# Append-only per-session transcript and match logs; empty disables them
+SESSION_LOG_DIR = os.environ.get('TRANSCRIPTION_SESSION_LOG_DIR', os.path.join(
+    os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'transcription', 'sessions'
+))
+SESSION_LOG_FSYNC_INTERVAL = 1.0  # Seconds between fsyncs; everything written in between shares one
+SESSION_LOG_RETENTION_DAYS = 7  # Session logs untouched for this long are deleted at startup
 
 # Global variables for sentence similarity
 model = None
-bullet_points = []
-bullet_embeddings = None
-# Track recent words and last matched text
-recent_words = []
-MIN_NEW_WORDS = 5  # Minimum number of new words required before matching again
-ROLLING_WINDOW_SIZE = 10  # Number of words to keep in recent words
+model_backend = None  # Backend the loaded model actually runs on
+embedding_cache = None  # On-disk cache of bullet embeddings, opened after the model loads
+query_memo = None  # In-memory LRU of transcript chunk embeddings, reset when a model loads
+MIN_NEW_WORDS = 5  # New words that trigger a match on their own
+MATCH_MAX_INTERVAL = 2.0  # Seconds after which any new words trigger a match
+MATCH_LATENCY_BUDGET = 0.15  # Match time above which the scheduler backs off
+MATCH_MAX_BACKOFF = 4.0  # Upper bound on the back-off multiplier under CPU pressure
+SCORE_NEAR_MARGIN = 0.1  # A rising best score this close to the threshold halves the words needed
+TRANSCRIPT_CHUNK_WORDS = 256  # Words per sealed chunk of the stored transcript
+SEGMENT_MAX_WORDS = 12  # Words per sentence/phrase chunk embedded for matching; bounds every encode
+SEGMENT_OVERLAP_WORDS = 4  # Words each chunk repeats from the previous one, so matches can span a break
+QUERY_MEMO_SIZE = 512  # Query texts whose embeddings are kept in memory
 # --- End Sentence Similarity Setup ---
 
-# Global flag to control the recording state
-recording = False
-# Global recorder instance
-recorder = None
-# Global flag to track if recorder is initialized
-recorder_initialized = False
+# Recorders shared by every session; leased while a session records
+model_pool = None
+# Sessions for the currently connected clients
+sessions = set()
+# Models load in the background after the server binds; each component reports its own status
+COMPONENTS = ('embedding', 'recorder')
+component_status = {name: 'pending' for name in COMPONENTS}
+# Set once a component has finished loading, whether it succeeded or failed
+component_events = {name: asyncio.Event() for name in COMPONENTS}
+# Timings for the startup sequence and background model loads
+startup_profile = None
+# Event loop running the server; recorder threads hand work to it with call_soon_threadsafe
+main_loop = None
 # Queue for transcription updates
-transcription_queue = queue.SimpleQueue()
+transcription_queue = asyncio.Queue()
 # Queue for similarity results
-similarity_queue = queue.SimpleQueue()
+similarity_queue = asyncio.Queue()
+# Worker pool that runs similarity matching off the event loop
+match_executor = None
+MATCH_WORKERS = 2  # Each session matches one transcript at a time; workers serve sessions in parallel
+MATCH_QUEUE_SIZE = 8  # Maximum number of sessions with a transcript waiting to be matched
+# Audio format RealtimeSTT's feed_audio consumes: 16 kHz mono int16 PCM
+RECORDER_SAMPLE_RATE = 16000
+AUDIO_FORMATS = ('int16', 'float32')
+INGEST_BUFFER_SAMPLES = 16384  # Preallocated ingest buffer; grown only for oversized frames
+# Whisper settings shared by the live recorder and batch mode
+RECORDER_MODEL = 'tiny.en'
+RECORDER_COMPUTE_TYPE = 'int8_float32'
+RECORDER_BEAM_SIZE = 5
+RECORDER_WARMUP_SECONDS = 1.0  # Silence transcribed once at load so the first utterance skips model initialization
+RECORDER_USE_MICROPHONE = True  # False records only audio clients stream over the websocket
+AUDIO_BUFFER_MS = 2000  # Audio held back for a lagging recorder before frames are dropped
+# 'silence_first' drops quiet frames before speech, 'oldest' drops from the front, 'newest' rejects incoming frames
+AUDIO_DROP_POLICIES = ('silence_first', 'oldest', 'newest')
+AUDIO_DROP_POLICY = 'silence_first'
+AUDIO_SILENCE_RMS = 300.0  # int16 RMS below which a frame counts as silence
+RECORDER_QUEUE_LIMIT = 16  # Chunks waiting in the recorder's audio queue before frames are held back
+RECORDER_CHUNK_SAMPLES = 512  # Samples per chunk RealtimeSTT puts on its audio queue
+FLOW_CONTROL_HIGH = 0.75  # Buffer fill at which the client is asked to slow down
+FLOW_CONTROL_LOW = 0.25  # Buffer fill at which it is told to resume
+# Protocol 1 sends the full transcript text per message; 2 sends transcript deltas batched per tick;
+# 3 sends realtime matches as match_provisional and confirms or corrects them from the final text;
+# 4 adds coverage messages as bullets get matched
+PROTOCOL_VERSIONS = (1, 2, 3, 4)
+MATCH_STATUSES = ('confirmed', 'corrected', 'new', 'retracted')
+# Protocol 2 encodings: 'binary' packs match results and audio acks into fixed-layout records
+ENCODINGS = ('json', 'binary')
+OUTBOUND_TICK = 0.05  # Seconds protocol 2 messages are collected before one frame is sent
+LATENCY_WINDOW = 2048  # Samples per pipeline stage kept for rolling percentiles
+LATENCY_PERCENTILES = (50, 95, 99)
+# Port of the local Prometheus text endpoint; disabled unless set
+METRICS_PORT = int(os.environ['TRANSCRIPTION_METRICS_PORT']) if os.environ.get('TRANSCRIPTION_METRICS_PORT') else None
 # Flag to track if shutdown is in progress
 shutdown_in_progress = False
 # Flag to track if we're handling a signal
 handling_signal = False
-# Global variable to track total word count
-total_word_count = 5
-last_deleted_word_count = 0
-# Track the last transcript seen
-last_transcribed_text = ""
-# Global variable to track the full transcript
-full_transcript = ""
 
 # Signal handler for graceful shutdown
 def signal_handler(sig, frame):
@@ -76,11 +260,11 @@ def signal_handler(sig, frame):
         # Set the shutdown flag
         shutdown_in_progress = True
         
-        # Stop recording if it's active
-        global recording
-        if recording:
-            recording = False
-            print("Stopped recording before shutdown")
+        # Stop recording in every session
+        for session in list(sessions):
+            if session.recording:
+                session.recording = False
+                print("Stopped recording before shutdown")
         
         # Properly shut down the recorder
         shutdown_recorder()
@@ -92,95 +276,653 @@ def signal_handler(sig, frame):
     finally:
         sys.exit(0)
 
+# --- Embedding Index ---
+def top_k_indices(scores, k):
+    """Returns the indices of the k highest scores, highest first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    # argpartition is O(n); only the k survivors get fully sorted
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+class EmbeddingIndex:
+    """Base class for bullet embedding indexes.
+
+    Subclasses implement _build and _search; this class keeps latency and
+    sampled recall statistics so every backend reports the same numbers.
+    """
+    name = "base"
+
+    def __init__(self):
+        self.embeddings = None
+        self.searches = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.recall_total = 0.0
+        self.recall_samples = 0
+
+    def __len__(self):
+        return 0 if self.embeddings is None else len(self.embeddings)
+
+    def build(self, embeddings):
+        """Builds the index over L2-normalized float32 rows."""
+        start_time = time.perf_counter()
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self._build(self.embeddings)
+        logger.info("Built %s index over %d embeddings in %.1f ms", self.name, len(self), (time.perf_counter() - start_time) * 1000)
+
+    def search(self, query, top_k):
+        """Returns (ids, scores) of the top_k rows by dot product, highest first."""
+        start_time = time.perf_counter()
+        ids, scores = self._search(query, top_k)
+        elapsed = time.perf_counter() - start_time
+        self.searches += 1
+        self.total_latency += elapsed
+        self.max_latency = max(self.max_latency, elapsed)
+        if self.searches % RECALL_SAMPLE_INTERVAL == 0:
+            self._sample_recall(query, ids, top_k)
+        return ids, scores
+
+    def _sample_recall(self, query, ids, top_k):
+        """Compares a result set against exact search to estimate recall@k."""
+        exact = top_k_indices(self.embeddings @ query, top_k)
+        if len(exact):
+            self.recall_total += len(np.intersect1d(ids, exact)) / len(exact)
+            self.recall_samples += 1
+
+    def stats(self):
+        """Returns latency and recall statistics for this index."""
+        return {
+            "backend": self.name,
+            "size": len(self),
+            "searches": self.searches,
+            "mean_latency_ms": self.total_latency / self.searches * 1000 if self.searches else 0.0,
+            "max_latency_ms": self.max_latency * 1000,
+            "recall_at_k": self.recall_total / self.recall_samples if self.recall_samples else None,
+            "recall_samples": self.recall_samples,
+        }
+
+    def _build(self, embeddings):
+        raise NotImplementedError
+
+    def _search(self, query, top_k):
+        raise NotImplementedError
+
+class BruteForceIndex(EmbeddingIndex):
+    """Exact search: one matrix-vector product over every row."""
+    name = "brute_force"
+
+    def _build(self, embeddings):
+        pass
+
+    def _search(self, query, top_k):
+        scores = self.embeddings @ query
+        ids = top_k_indices(scores, top_k)
+        return ids, scores[ids]
+
+class IVFIndex(EmbeddingIndex):
+    """Approximate search with an inverted file over spherical k-means lists.
+
+    Rows are stored grouped by list so a query only scores the rows of the
+    nprobe lists whose centroids are closest to it.
+    """
+    name = "ivf"
+
+    def __init__(self, nlist=None, nprobe=IVF_NPROBE, iterations=10, seed=0):
+        super().__init__()
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.seed = seed
+        self.centroids = None
+        self.list_ids = None
+        self.list_vectors = None
+        self.list_offsets = None
+
+    def _build(self, embeddings):
+        n = len(embeddings)
+        nlist = min(n, self.nlist or max(1, int(np.sqrt(n))))
+        rng = np.random.default_rng(self.seed)
+        centroids = embeddings[rng.choice(n, nlist, replace=False)].copy()
+        for _ in range(self.iterations):
+            assignments = np.argmax(embeddings @ centroids.T, axis=1)
+            # One-hot matmul sums each list's rows without a Python loop
+            one_hot = np.zeros((n, nlist), dtype=np.float32)
+            one_hot[np.arange(n), assignments] = 1.0
+            sums = one_hot.T @ embeddings
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty lists keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+        assignments = np.argmax(embeddings @ centroids.T, axis=1)
+        order = np.argsort(assignments, kind='stable')
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.list_ids = order
+        self.list_vectors = np.ascontiguousarray(embeddings[order])
+        self.list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assignments, minlength=nlist))))
+
+    def _search(self, query, top_k):
+        probe = top_k_indices(self.centroids @ query, self.nprobe)
+        rows = np.concatenate([
+            np.arange(self.list_offsets[c], self.list_offsets[c + 1]) for c in probe
+        ])
+        scores = self.list_vectors[rows] @ query
+        best = top_k_indices(scores, top_k)
+        return self.list_ids[rows[best]], scores[best]
+
+def create_index(embeddings, backend=None):
+    """Builds the index backend requested, or picks one by size for 'auto'."""
+    backend = backend or INDEX_BACKEND
+    if backend == 'auto':
+        backend = 'ivf' if len(embeddings) >= ANN_MIN_BULLETS else 'brute_force'
+    if backend == 'ivf':
+        index = IVFIndex()
+    elif backend == 'brute_force':
+        index = BruteForceIndex()
+    else:
+        raise ValueError(f"Unknown index backend: {backend}")
+    index.build(embeddings)
+    return index
+# --- End Embedding Index ---
+
+# --- Embedding Cache ---
+def normalize_cache_text(text):
+    """Normalizes text so trivially different strings share a cache entry."""
+    return " ".join(unicodedata.normalize('NFC', text).split())
+
+class EmbeddingCache:
+    """Content-addressed, memory-mapped store of text embeddings.
+
+    Entries are keyed by a hash of (model name, normalized text) and live in a
+    fixed-capacity .npy memmap. An OrderedDict tracks LRU order; when the file
+    is full the least recently used slot is reused. The key -> slot table is
+    persisted next to the memmap so a cold start can reuse earlier encodes.
+    """
+
+    def __init__(self, model_name, dim, directory=EMBEDDING_CACHE_DIR,
+                 dtype=EMBEDDING_CACHE_DTYPE, max_mb=EMBEDDING_CACHE_MAX_MB):
+        self.model_name = model_name
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.capacity = max(1, int(max_mb * 1024 * 1024) // (dim * self.dtype.itemsize))
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', model_name).strip('_')
+        base = os.path.join(directory, f"{slug}_{dim}_{self.dtype.name}")
+        self.data_path = base + ".npy"
+        self.index_path = base + ".json"
+        self.slots = OrderedDict()  # key -> slot, least recently used first
+        self.vectors = self._open()
+
+    def _open(self):
+        """Opens the memmap and slot table, starting fresh if they don't match."""
+        try:
+            if os.path.exists(self.data_path) and os.path.exists(self.index_path):
+                vectors = np.lib.format.open_memmap(self.data_path, mode='r+')
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+                if vectors.shape == (self.capacity, self.dim) and vectors.dtype == self.dtype \
+                        and index.get("model") == self.model_name:
+                    self.slots = OrderedDict((key, slot) for key, slot in index.get("entries", []))
+                    return vectors
+                del vectors
+                print("Embedding cache layout changed, rebuilding cache file")
+        except Exception as e:
+            logger.warning("Could not load embedding cache, rebuilding it: %s", e)
+        self.slots = OrderedDict()
+        return np.lib.format.open_memmap(
+            self.data_path, mode='w+', dtype=self.dtype, shape=(self.capacity, self.dim)
+        )
+
+    def key(self, text):
+        """Returns the cache key for a text under this cache's model."""
+        content = f"{self.model_name}\0{normalize_cache_text(text)}"
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    def get_many(self, texts):
+        """Returns a list with a float32 embedding per text, or None for misses."""
+        results = []
+        with self.lock:
+            for text in texts:
+                key = self.key(text)
+                slot = self.slots.get(key)
+                if slot is None:
+                    self.misses += 1
+                    results.append(None)
+                    continue
+                self.slots.move_to_end(key)
+                self.hits += 1
+                vector = np.asarray(self.vectors[slot], dtype=np.float32)
+                # Re-normalize to undo float16 rounding drift
+                results.append(vector / max(np.linalg.norm(vector), 1e-12))
+        return results
+
+    def put_many(self, texts, embeddings):
+        """Stores embeddings for texts, evicting least recently used entries when full."""
+        with self.lock:
+            for text, embedding in zip(texts, embeddings):
+                key = self.key(text)
+                slot = self.slots.get(key)
+                if slot is None:
+                    if len(self.slots) < self.capacity:
+                        slot = len(self.slots)
+                    else:
+                        _, slot = self.slots.popitem(last=False)
+                self.slots[key] = slot
+                self.slots.move_to_end(key)
+                self.vectors[slot] = embedding
+
+    def flush(self):
+        """Writes the memmap and slot table to disk."""
+        with self.lock:
+            try:
+                self.vectors.flush()
+                temp_path = self.index_path + ".tmp"
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump({"model": self.model_name, "entries": list(self.slots.items())}, f)
+                os.replace(temp_path, self.index_path)
+            except Exception as e:
+                logger.warning("Failed to flush embedding cache: %s", e)
+
+def open_embedding_cache():
+    """Opens the embedding cache for the loaded model; matching works without it."""
+    global embedding_cache
+    try:
+        embedding_cache = EmbeddingCache(embedding_model_id(), model.get_sentence_embedding_dimension())
+        print(f"Opened embedding cache with {len(embedding_cache.slots)} entries at {embedding_cache.data_path}")
+    except Exception as e:
+        logger.warning("Embedding cache disabled: %s", e)
+        embedding_cache = None
+
+def encode_texts_cached(texts):
+    """Encodes a list of texts, only running the model on cache misses."""
+    if embedding_cache is None:
+        return encode_texts(texts)
+    cached = embedding_cache.get_many(texts)
+    missing = [i for i, vector in enumerate(cached) if vector is None]
+    if missing:
+        encoded = encode_texts([texts[i] for i in missing])
+        embedding_cache.put_many([texts[i] for i in missing], encoded)
+        embedding_cache.flush()
+        for i, vector in zip(missing, encoded):
+            cached[i] = vector
+    logger.debug("Embedding cache: %d hits, %d encoded", len(texts) - len(missing), len(missing))
+    return np.stack(cached).astype(np.float32, copy=False)
+
+class QueryEmbeddingMemo:
+    """Thread-safe LRU of query text -> embedding for the match path.
+
+    Consecutive transcript updates and recent-word windows repeat the same
+    text often, so identical queries skip the encoder entirely.
+    """
+
+    def __init__(self, max_entries=QUERY_MEMO_SIZE):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, texts):
+        """Returns one embedding per text, encoding all misses in a single batch."""
+        results = [None] * len(texts)
+        missing = []
+        with self.lock:
+            for i, text in enumerate(texts):
+                embedding = self.entries.get(text)
+                if embedding is None:
+                    missing.append(i)
+                else:
+                    self.entries.move_to_end(text)
+                    results[i] = embedding
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        if missing:
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            encoded = dict(zip(unique, encode_texts(unique)))
+            with self.lock:
+                for text, embedding in encoded.items():
+                    self.entries[text] = embedding
+                    self.entries.move_to_end(text)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+            for i in missing:
+                results[i] = encoded[texts[i]]
+        return results
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+# --- End Embedding Cache ---
+
 # --- Sentence Similarity Functions ---
-def load_similarity_model(model_name=MODEL_NAME):
-    """Loads the sentence transformer model."""
-    global model
+def build_embedding_model(model_name=MODEL_NAME, backend=EMBEDDING_BACKEND):
+    """Builds a SentenceTransformer on the given backend; every backend shares the same encode()."""
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+    # Deferred import: sentence_transformers pulls in torch, which dominates startup
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, **EMBEDDING_BACKENDS[backend])
+
+def embedding_model_id():
+    """Identifies the loaded model for cache keys; quantized backends produce different vectors."""
+    if model_backend in (None, 'torch'):
+        return MODEL_NAME
+    return f"{MODEL_NAME}@{model_backend}"
+
+def load_similarity_model(model_name=MODEL_NAME, backend=None):
+    """Loads the sentence transformer model, falling back to PyTorch if the chosen backend fails."""
+    global model, model_backend
+    backend = backend or EMBEDDING_BACKEND
     try:
-        model = SentenceTransformer(model_name)
-        print(f"Loaded SentenceTransformer model: {model_name}")
+        try:
+            model = build_embedding_model(model_name, backend)
+        except Exception as e:
+            if backend == 'torch':
+                raise
+            logger.error("Failed to load %s embedding backend, falling back to torch: %s", backend, e)
+            backend = 'torch'
+            model = build_embedding_model(model_name, backend)
+        model_backend = backend
+        print(f"Loaded SentenceTransformer model: {model_name} ({backend} backend)")
+        open_embedding_cache()
+        global query_memo
+        query_memo = QueryEmbeddingMemo()
         return True
     except Exception as e:
         logging.error(f"Failed to load sentence similarity model: {e}")
         model = None
+        model_backend = None
         return False
 
-def precompute_bullet_embeddings(points):
-    """Precomputes embeddings for the list of bullet points."""
-    global bullet_points, bullet_embeddings, recent_words
-    bullet_points = points
-    recent_words = []  # Reset recent words when bullet points change
-    if not points:
-        bullet_embeddings = None
-        print("Bullet points list is empty. Cleared embeddings.")
-        return
-    
-    print(f"Precomputing embeddings for {len(points)} bullet points...")
-    start_time = time.time()
-    
-    try:
-        bullet_embeddings = model.encode(points, convert_to_tensor=True)
-        end_time = time.time()
-        print(f"Precomputation finished in {end_time - start_time:.2f} seconds.")
-    except Exception as e:
-        bullet_embeddings = None
-        print(f"Failed to precompute bullet embeddings: {e}")
-
-def find_best_match(transcript_text):
-    """Finds the best matching bullet point for the given transcript."""
-    global recent_words, last_deleted_word_count, total_word_count
-    
-    if bullet_embeddings is None or len(bullet_points) == 0 or not transcript_text:
-        if bullet_embeddings is None:
-            print("No bullet embeddings available for matching.")
-        elif len(bullet_points) == 0:
-            print("No bullet points available for matching.")
-        elif not transcript_text:
-            print("Empty transcript text, skipping matching.")
-        return None, 0.0  # No match if no bullets or empty transcript
-
-    try:
-        # Update recent words
-        words = transcript_text.split()
-        recent_words.extend(words)
-        if len(recent_words) > ROLLING_WINDOW_SIZE:  # Keep only last ROLLING_WINDOW_SIZE words
-            recent_words = recent_words[-ROLLING_WINDOW_SIZE:]
-        
-        if total_word_count - last_deleted_word_count < MIN_NEW_WORDS:
-            print(f"Not enough new words ({total_word_count - last_deleted_word_count}) to match. Returning None.\n")
-            last_deleted_word_count = total_word_count
-            return None, 0.0
-
-        # Encode the transcript text
-        transcript_embedding = model.encode(transcript_text, convert_to_tensor=True)
-        
-        # Only compute score for the first bullet point
-        first_bullet_embedding = bullet_embeddings[0].unsqueeze(0)  # Add batch dimension
-        score = util.dot_score(transcript_embedding, first_bullet_embedding)[0].cpu().item()
-        
-        # Log the score and distance
-        print("--------------------------------")
-        print(f"Comparing transcript: {transcript_text}")
-        print(f"Score: {score:.4f}\n")
-        
-        if score >= SIMILARITY_THRESHOLD:
-            return bullet_points[0], score
+def encode_texts(texts, encoder=None):
+    """Encodes text(s) into L2-normalized float32 embeddings."""
+    embeddings = (encoder or model).encode(
+        texts,
+        batch_size=EMBEDDING_BATCH_SIZE,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+    )
+    return np.asarray(embeddings, dtype=np.float32)
+
+def check_embedding_parity(backend, reference_backend='torch', texts=PARITY_SENTENCES):
+    """Compares a backend's embeddings and encode speed against the reference backend.
+
+    Reports the per-sentence cosine between the two backends, the largest
+    change in pairwise similarity (what matching thresholds see) and whether
+    every sentence keeps the same nearest neighbour.
+    """
+    results = {}
+    embeddings = {}
+    for name in (reference_backend, backend):
+        start_time = time.perf_counter()
+        encoder = build_embedding_model(MODEL_NAME, name)
+        load_time = time.perf_counter() - start_time
+        encode_texts(texts[:1], encoder)  # Warm-up so the timing below is steady state
+        start_time = time.perf_counter()
+        embeddings[name] = encode_texts(texts, encoder)
+        results[name] = {
+            "load_s": round(load_time, 3),
+            "encode_ms_per_text": round((time.perf_counter() - start_time) * 1000 / len(texts), 3),
+        }
+    reference, candidate = embeddings[reference_backend], embeddings[backend]
+    cosines = np.sum(reference * candidate, axis=1)
+    reference_similarity = reference @ reference.T
+    candidate_similarity = candidate @ candidate.T
+    similarity_error = np.abs(reference_similarity - candidate_similarity).max()
+    # Ignore self-similarity when looking for each sentence's nearest neighbour
+    np.fill_diagonal(reference_similarity, -np.inf)
+    np.fill_diagonal(candidate_similarity, -np.inf)
+    same_neighbour = np.argmax(reference_similarity, axis=1) == np.argmax(candidate_similarity, axis=1)
+    return {
+        "backend": backend,
+        "reference": reference_backend,
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean()),
+        "max_similarity_error": float(similarity_error),
+        "neighbour_agreement": float(same_neighbour.mean()),
+        "timings": results,
+        "passed": bool(cosines.min() >= PARITY_MIN_COSINE),
+    }
+
+def parse_bullet_items(points, thresholds=None):
+    """Normalizes bullet payloads into (id, text, threshold) tuples.
+
+    Points may be plain strings, which get their list position as id, or
+    dicts with 'text' and optional 'id' and 'threshold' keys. The legacy
+    'thresholds' list is applied by position.
+    """
+    items = []
+    for i, point in enumerate(points):
+        threshold = thresholds[i] if thresholds and i < len(thresholds) else None
+        if isinstance(point, dict):
+            bullet_id = str(point.get("id", i))
+            text = point.get("text", "")
+            threshold = point.get("threshold", threshold)
         else:
-            # Try matching with recent words as fallback
-            if recent_words:
-                recent_text = " ".join(recent_words)
-                recent_embedding = model.encode(recent_text, convert_to_tensor=True)
-                recent_score = util.dot_score(recent_embedding, first_bullet_embedding)[0].cpu().item()
-                print(f"Fallback: comparing recent words: {recent_text}")
-                print(f"Fallback: match score with recent words: {recent_score:.4f}\n\n")
-                
-                if recent_score >= SIMILARITY_THRESHOLD:
-                    return bullet_points[0], recent_score
-            
-            return None, score  # No match above threshold
-    except Exception as e:
-        logging.error(f"Error finding best match: {e}")
-        return None, 0.0
+            bullet_id, text = str(i), point
+        items.append((bullet_id, text, None if threshold is None else float(threshold)))
+    return items
+
+class BulletStore:
+    """Bullet points with their embeddings, thresholds and search index.
+
+    Rows are addressed by id so edits only touch the affected embeddings.
+    Writers build new arrays and swap them in under the lock, so matching
+    always sees a consistent snapshot without waiting on an encode.
+
+    Covered (already matched) bullets are left out of the index, so the
+    candidate set shrinks as they get matched; active maps index rows back
+    to bullet rows and is None while every bullet is a candidate.
+    """
+
+    def __init__(self, suppress=None, rearm_seconds=None):
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.ids = []
+        self.texts = []
+        self.embeddings = None
+        self.thresholds = None
+        self.index = None
+        self.index_backend = None
+        self.active = None
+        self.suppress = COVERAGE_SUPPRESS if suppress is None else suppress
+        self.rearm_seconds = COVERAGE_REARM_SECONDS if rearm_seconds is None else rearm_seconds
+        # Id -> monotonic time it was matched; replaced rather than mutated so readers need no lock
+        self.covered = {}
+        self.rearmed = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def set(self, items, index_backend=None):
+        """Replaces every bullet, reusing embeddings for texts already stored; coverage starts over."""
+        with self.write_lock:
+            self.covered = {}
+            with self.lock:
+                known = dict(zip(self.texts, self.embeddings)) if self.embeddings is not None else {}
+            texts = [text for _, text, _ in items]
+            missing = list(dict.fromkeys(text for text in texts if text not in known))
+            if missing:
+                known.update(zip(missing, encode_texts_cached(missing)))
+            embeddings = np.stack([known[text] for text in texts]) if texts else None
+            thresholds = np.array(
+                [SIMILARITY_THRESHOLD if threshold is None else threshold for _, _, threshold in items],
+                dtype=np.float32,
+            )
+            self._commit([bullet_id for bullet_id, _, _ in items], texts, embeddings, thresholds,
+                         index_backend or self.index_backend)
+            return len(missing)
+
+    def update(self, upserts, removes, index_backend=None):
+        """Applies removes and add/replace upserts by id, encoding only new or changed texts.
+
+        upserts maps id -> (text, threshold); a None threshold keeps the current
+        one for replaced rows and uses SIMILARITY_THRESHOLD for added rows.
+        """
+        with self.write_lock:
+            with self.lock:
+                ids, texts = self.ids, self.texts
+                embeddings, thresholds = self.embeddings, self.thresholds
+            keep = [row for row, bullet_id in enumerate(ids) if bullet_id not in removes]
+            ids = [ids[row] for row in keep]
+            texts = [texts[row] for row in keep]
+            embeddings = embeddings[keep] if embeddings is not None else np.empty((0, 0), dtype=np.float32)
+            thresholds = thresholds[keep] if thresholds is not None else np.empty(0, dtype=np.float32)
+            positions = {bullet_id: row for row, bullet_id in enumerate(ids)}
+
+            changed, added = [], []
+            for bullet_id, (text, threshold) in upserts.items():
+                row = positions.get(bullet_id)
+                if row is None:
+                    added.append((bullet_id, text, threshold))
+                    continue
+                if threshold is not None:
+                    thresholds[row] = threshold
+                if texts[row] != text:
+                    texts[row] = text
+                    changed.append(row)
+
+            # An edited or re-added bullet is new content, so it is a candidate again
+            fresh = {ids[row] for row in changed} | {bullet_id for bullet_id, _, _ in added}
+            self.covered = {bullet_id: at for bullet_id, at in self.covered.items() if bullet_id not in fresh}
+
+            encode = [texts[row] for row in changed] + [text for _, text, _ in added]
+            if encode:
+                encoded = encode_texts_cached(encode)
+                if len(embeddings) == 0:
+                    embeddings = np.empty((0, encoded.shape[1]), dtype=np.float32)
+                embeddings[changed] = encoded[:len(changed)]
+                embeddings = np.vstack([embeddings, encoded[len(changed):]])
+            ids += [bullet_id for bullet_id, _, _ in added]
+            texts += [text for _, text, _ in added]
+            thresholds = np.concatenate([thresholds, np.array(
+                [SIMILARITY_THRESHOLD if threshold is None else threshold for _, _, threshold in added],
+                dtype=np.float32,
+            )])
+            self._commit(ids, texts, embeddings if ids else None, thresholds,
+                         index_backend or self.index_backend)
+            return len(encode)
+
+    def _commit(self, ids, texts, embeddings, thresholds, index_backend):
+        """Builds the index over the uncovered rows of new arrays and swaps them in."""
+        known = set(ids)
+        self.covered = {bullet_id: at for bullet_id, at in self.covered.items() if bullet_id in known}
+        active = None
+        if self.covered and embeddings is not None:
+            active = np.array([row for row, bullet_id in enumerate(ids) if bullet_id not in self.covered], dtype=np.intp)
+        candidates = embeddings if active is None else embeddings[active]
+        index = create_index(candidates, index_backend) if candidates is not None and len(candidates) else None
+        with self.lock:
+            self.ids, self.texts = ids, texts
+            self.embeddings, self.thresholds = embeddings, thresholds
+            self.index, self.index_backend, self.active = index, index_backend, active
+
+    def snapshot(self):
+        """Returns (ids, texts, thresholds, embeddings, index, active) as one consistent view."""
+        with self.lock:
+            return self.ids, self.texts, self.thresholds, self.embeddings, self.index, self.active
+
+    def cover(self, bullet_ids):
+        """Marks bullets as matched and rebuilds the candidate index without them.
+
+        Returns the ids that weren't covered yet; does nothing unless
+        suppression is on.
+        """
+        if not self.suppress:
+            return []
+        with self.write_lock:
+            now = time.monotonic()
+            known = set(self.ids)
+            new = [bullet_id for bullet_id in dict.fromkeys(bullet_ids) if bullet_id in known and bullet_id not in self.covered]
+            if new:
+                self.covered = {**self.covered, **{bullet_id: now for bullet_id in new}}
+                self._commit(self.ids, self.texts, self.embeddings, self.thresholds, self.index_backend)
+            return new
+
+    def rearm(self, bullet_ids=None):
+        """Makes covered bullets candidates again; None re-arms those covered longer than rearm_seconds."""
+        with self.write_lock:
+            if bullet_ids is None:
+                if not self.rearm_seconds:
+                    return []
+                cutoff = time.monotonic() - self.rearm_seconds
+                bullet_ids = [bullet_id for bullet_id, at in self.covered.items() if at <= cutoff]
+            rearmed = [bullet_id for bullet_id in dict.fromkeys(bullet_ids) if bullet_id in self.covered]
+            if rearmed:
+                self.covered = {bullet_id: at for bullet_id, at in self.covered.items() if bullet_id not in rearmed}
+                self.rearmed += len(rearmed)
+                self._commit(self.ids, self.texts, self.embeddings, self.thresholds, self.index_backend)
+            return rearmed
+
+    def coverage(self):
+        """Returns the matched bullet ids and how far through the list the session is."""
+        with self.lock:
+            total = len(self.ids)
+            candidates = len(self.index) if self.index is not None else 0
+        covered = list(self.covered)
+        return {
+            "covered": covered,
+            "count": len(covered),
+            "total": total,
+            "ratio": len(covered) / total if total else 0.0,
+            "candidates": candidates,
+            "rearmed": self.rearmed,
+        }
+
+class BulletUpdateDebouncer:
+    """Merges bursts of update_bullet_points messages into one encode batch.
+
+    Edits are folded into a pending id -> text map; the store is only updated
+    once no new edit has arrived for `delay` seconds.
+    """
+
+    def __init__(self, store, on_applied, delay=BULLET_UPDATE_DEBOUNCE):
+        self.store = store
+        self.on_applied = on_applied
+        self.delay = delay
+        self.upserts = {}
+        self.removes = set()
+        self.task = None
+
+    def submit(self, add=(), remove=(), replace=()):
+        """Queues an edit and restarts the debounce timer."""
+        for bullet_id, text, threshold in parse_bullet_items(list(add) + list(replace)):
+            self.removes.discard(bullet_id)
+            self.upserts[bullet_id] = (text, threshold)
+        for bullet_id in remove:
+            self.upserts.pop(str(bullet_id), None)
+            self.removes.add(str(bullet_id))
+        if self.task:
+            self.task.cancel()
+        self.task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.delay)
+        # Past this point the batch is owned by this task and must not be cancelled
+        self.task = None
+        if not await wait_for_component('embedding'):
+            logger.error("Dropping bullet update: embedding model is not available")
+            return
+        upserts, removes = self.upserts, self.removes
+        self.upserts, self.removes = {}, set()
+        try:
+            start_time = time.time()
+            encoded = await asyncio.get_event_loop().run_in_executor(None, self.store.update, upserts, removes)
+            logger.info("Applied bullet update (%d upserts, %d removes, %d encoded) in %.2f seconds.",
+                        len(upserts), len(removes), encoded, time.time() - start_time)
+            await self.on_applied()
+        except Exception as e:
+            logger.error("Failed to apply bullet update: %s", e)
+
+    def cancel(self):
+        """Drops any pending edits that have not been applied yet."""
+        if self.task:
+            self.task.cancel()
+            self.task = None
 
 # --- End Sentence Similarity Functions ---
 
@@ -188,225 +930,1986 @@ async def send_message(websocket, message_type, data):
     """Helper function to send JSON messages"""
     try:
         payload = {"type": message_type, **data}
+        start_time = time.perf_counter()
         await websocket.send(json.dumps(payload))
+        pipeline_latency["send"].record(time.perf_counter() - start_time)
     except websockets.exceptions.ConnectionClosed:
         logging.warning(f"Connection closed while sending {message_type}")
     except Exception as e:
         logging.error(f"Error sending {message_type}: {e}")
 
-def strip_dots_and_spaces(text: str) -> str:
-    """Removes dots and extra spaces from the text."""
-    return re.sub(r'[.\s]+', ' ', text).strip()
+# Dots and whitespace separate words; transcripts that differ only in them are duplicates
+WORD_SEPARATORS = re.compile(r'[.\s]+')
+
+def tokenize(text: str) -> list:
+    """Splits text into words, dropping dots and extra spaces."""
+    return [word for word in WORD_SEPARATORS.split(text) if word]
+
+class StreamingTranscript:
+    """Incremental view of the stabilized realtime text plus the stored session transcript.
+
+    Realtime text usually grows by appending to the previous update, so only
+    the appended suffix is tokenized and the previous word list is extended
+    in place. Revisions that rewrite earlier words fall back to a full
+    tokenize and common-prefix diff. New words go into fixed-size chunks, so
+    appending never copies the transcript stored so far.
+    """
+
+    def __init__(self, chunk_words=TRANSCRIPT_CHUNK_WORDS):
+        self.chunk_words = chunk_words
+        self.last_text = ""
+        self.last_words = []
+        self.chunks = []  # Sealed chunks of chunk_words words each
+        self.tail = []  # Words of the chunk being filled
+        self.word_count = 0
+
+    def update(self, text):
+        """Returns the words added relative to the previous text, or None if nothing changed."""
+        previous = self.last_text
+        self.last_text = text
+        if previous and text.startswith(previous):
+            suffix_words = tokenize(text[len(previous):])
+            continues_word = (
+                self.last_words
+                and not WORD_SEPARATORS.match(previous[-1])
+                and len(text) > len(previous)
+                and not WORD_SEPARATORS.match(text[len(previous)])
+            )
+            if continues_word:
+                # The last word kept growing ("wor" -> "world"): it counts as changed
+                merged = self.last_words[-1] + suffix_words[0]
+                self.last_words[-1] = merged
+                self.last_words.extend(suffix_words[1:])
+                added = [merged] + suffix_words[1:]
+            elif suffix_words:
+                self.last_words.extend(suffix_words)
+                added = suffix_words
+            else:
+                return None
+        else:
+            words = tokenize(text)
+            if words == self.last_words:
+                return None
+            i = 0
+            limit = min(len(words), len(self.last_words))
+            while i < limit and words[i] == self.last_words[i]:
+                i += 1
+            self.last_words = words
+            added = words[i:]
+        self._append(added)
+        return added
+
+    def _append(self, words):
+        self.tail.extend(words)
+        self.word_count += len(words)
+        while len(self.tail) >= self.chunk_words:
+            self.chunks.append(" ".join(self.tail[:self.chunk_words]))
+            del self.tail[:self.chunk_words]
+
+    def restore(self, text):
+        """Stores the transcript of a resumed session; realtime updates continue after it."""
+        self._append(text.split())
+
+    def full_text(self):
+        """Joins the stored transcript; O(transcript length), so keep it off the hot path."""
+        return " ".join(self.chunks + self.tail)
+
+# Text ending a sentence or clause, after trailing whitespace
+SENTENCE_END = re.compile(r'[.!?;:]["\')\]]*\s*$')
+
+class MatchScheduler:
+    """Decides which transcript updates are worth an encode.
+
+    A match runs when enough new words have arrived, when the text ends a
+    sentence, or when max_interval has passed with any new words. Under CPU
+    pressure (matches slower than latency_budget, or sessions waiting on the
+    match workers) the word and time thresholds are scaled up to
+    max_backoff, and relaxed again once matches are fast. A best score rising
+    towards the threshold halves the words needed. Updates whose text is
+    unchanged since the last match are always skipped.
+    """
+
+    def __init__(self, min_new_words=MIN_NEW_WORDS, max_interval=MATCH_MAX_INTERVAL,
+                 latency_budget=MATCH_LATENCY_BUDGET, max_backoff=MATCH_MAX_BACKOFF):
+        self.min_new_words = min_new_words
+        self.max_interval = max_interval
+        self.latency_budget = latency_budget
+        self.max_backoff = max_backoff
+        self.backoff = 1.0
+        self.latency = None  # Moving average of match time, seconds
+        self.last_text = None
+        self.last_word_count = 0
+        self.last_match_time = time.monotonic()
+        self.scores = deque(maxlen=2)
+        self.started = time.monotonic()
+        self.triggered = {"new_words": 0, "sentence": 0, "interval": 0}
+        self.skipped = {"unchanged": 0, "too_few_words": 0}
+
+    def check(self, text, word_count):
+        """Returns the reason to match this update, or None to skip it."""
+        new_words = word_count - self.last_word_count
+        if text == self.last_text or new_words <= 0:
+            self.skipped["unchanged"] += 1
+            return None
+        required = self.min_new_words * self.backoff
+        if self._score_rising():
+            required /= 2
+        if new_words >= required:
+            reason = "new_words"
+        elif SENTENCE_END.search(text):
+            reason = "sentence"
+        elif time.monotonic() - self.last_match_time >= self.max_interval * self.backoff:
+            reason = "interval"
+        else:
+            self.skipped["too_few_words"] += 1
+            return None
+        self.triggered[reason] += 1
+        self.last_text = text
+        self.last_word_count = word_count
+        self.last_match_time = time.monotonic()
+        return reason
+
+    def _score_rising(self):
+        if len(self.scores) < 2:
+            return False
+        previous, last = self.scores
+        return last > previous and last >= SIMILARITY_THRESHOLD - SCORE_NEAR_MARGIN
+
+    def record(self, seconds, score, pending=0):
+        """Feeds back a match's duration and best score, and the sessions waiting behind it."""
+        self.scores.append(score)
+        self.latency = seconds if self.latency is None else 0.8 * self.latency + 0.2 * seconds
+        if self.latency > self.latency_budget or pending > 0:
+            self.backoff = min(self.max_backoff, self.backoff * 1.5)
+        else:
+            self.backoff = max(1.0, self.backoff / 1.25)
+
+    def stats(self):
+        """Returns trigger and skip counts and the encodes saved per minute."""
+        minutes = max(time.monotonic() - self.started, 1.0) / 60
+        saved = sum(self.skipped.values())
+        return {
+            "triggered": dict(self.triggered),
+            "skipped": dict(self.skipped),
+            "saved_per_minute": saved / minutes,
+            "backoff": self.backoff,
+            "latency_ms": self.latency * 1000 if self.latency is not None else None,
+        }
+
+# A word ending a phrase inside a sentence; long sentences are split here first
+PHRASE_END = re.compile(r',["\')\]]*$')
+
+def accumulate_scores(index, active, embeddings, best, top_k):
+    """Raises best[row] to each embedding's top-k scores; returns the rows that went up.
+
+    active maps index rows to bullet rows when covered bullets are left out.
+    """
+    raised = set()
+    for embedding in embeddings:
+        rows, scores = index.search(embedding, top_k)
+        if active is not None:
+            rows = active[rows]
+        for row, score in zip(rows, scores):
+            row, score = int(row), float(score)
+            if score > best.get(row, -1.0):
+                best[row] = score
+                raised.add(row)
+    return raised
+
+def ranked_matches(best, ids, texts, thresholds, top_k):
+    """Returns (matches, best_score) for the top-k accumulated bullets that clear their threshold."""
+    ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+    matches = [
+        {"index": row, "id": ids[row], "text": texts[row], "score": score}
+        for row, score in ranked
+        if score >= thresholds[row]
+    ][:top_k]
+    return matches, ranked[0][1] if ranked else 0.0
+
+class ChunkMatcher:
+    """Matches an utterance as overlapping sentence/phrase chunks instead of one growing text.
+
+    Sentences are packed from their phrases into pieces of at most
+    max_words - overlap_words words, and each chunk repeats the last
+    overlap_words words of the piece before it. Only chunks not seen earlier
+    in the utterance are embedded, in one batch, so an encode costs at most a
+    few chunks however long the utterance gets. A per-bullet accumulator keeps
+    each bullet's best score over the utterance's chunks; it restarts with
+    every utterance and whenever the bullet index is rebuilt.
+    """
+
+    def __init__(self, max_words=SEGMENT_MAX_WORDS, overlap_words=SEGMENT_OVERLAP_WORDS):
+        self.step = max(1, max_words - overlap_words)
+        self.overlap_words = overlap_words
+        self.index = None  # Index the accumulator's rows belong to
+        self.opening = []  # First words of the current utterance
+        self.seen = set()
+        self.best = {}  # Row -> best score over the utterance's chunks
+        self.utterances = 0
+        self.encoded = 0
+        self.reused = 0
+
+    def segment(self, text):
+        """Splits text into overlapping chunks of at most max_words words."""
+        chunks, carry, sentence = [], [], []
+        words = text.split()
+        for position, word in enumerate(words):
+            sentence.append(word)
+            if SENTENCE_END.search(word) or position == len(words) - 1:
+                for piece in self._pieces(sentence):
+                    chunks.append(" ".join(carry + piece))
+                    carry = piece[-self.overlap_words:] if self.overlap_words else []
+                sentence = []
+        return chunks
+
+    def _pieces(self, sentence):
+        """Packs a sentence's phrases into pieces of at most step words; long phrases are sliced."""
+        pieces, piece, phrase = [], [], []
+        for position, word in enumerate(sentence):
+            phrase.append(word)
+            if not (PHRASE_END.search(word) or position == len(sentence) - 1):
+                continue
+            if piece and len(piece) + len(phrase) > self.step:
+                pieces.append(piece)
+                piece = []
+            while len(phrase) > self.step:
+                pieces.append(phrase[:self.step])
+                phrase = phrase[self.step:]
+            piece.extend(phrase)
+            phrase = []
+        if piece:
+            pieces.append(piece)
+        return pieces
+
+    def new_chunks(self, text, index):
+        """Returns the chunks of text not scored yet in this utterance against this index."""
+        chunks = self.segment(text)
+        opening = text.split()[:self.overlap_words or 1]
+        # Realtime text restarts with each utterance; a different opening means a new one
+        if index is not self.index or opening[:len(self.opening)] != self.opening[:len(opening)]:
+            if index is self.index:
+                self.utterances += 1
+            self.index = index
+            self.seen.clear()
+            self.best.clear()
+        self.opening = opening
+        new = [chunk for chunk in dict.fromkeys(chunks) if chunk not in self.seen]
+        self.reused += len(chunks) - len(new)
+        self.seen.update(new)
+        return new
+
+    def match(self, bullets, text, top_k=TOP_K):
+        """Scores the new chunks of realtime text and returns (matches, best_score) from the accumulator.
+
+        matches is empty unless a new chunk raised a bullet that clears its
+        threshold, so a bullet already reported isn't sent again for every
+        later chunk of the same utterance. Returns None if no chunk is new.
+        """
+        ids, texts, thresholds, _, index, active = bullets.snapshot()
+        if index is None:
+            return [], 0.0
+        chunks = self.new_chunks(text, index)
+        if not chunks:
+            return None
+        self.encoded += len(chunks)
+        raised = accumulate_scores(index, active, query_memo.encode(chunks), self.best, top_k)
+        matches, best_score = ranked_matches(self.best, ids, texts, thresholds, top_k)
+        if not any(match["index"] in raised for match in matches):
+            return [], best_score
+        return matches, best_score
+
+    def settle(self, bullets, text, top_k=TOP_K, keep=()):
+        """Ranks an utterance's final text by its best chunk per bullet; leaves the realtime state alone.
+
+        keep holds the ids of the utterance's provisional matches. Each is
+        scored even if it has been covered since, and listed after the top-k
+        if it clears its threshold, so the final text can confirm every one.
+        """
+        ids, texts, thresholds, embeddings, index, active = bullets.snapshot()
+        chunk_embeddings = query_memo.encode(self.segment(text))
+        best = {}
+        if index is not None:
+            accumulate_scores(index, active, chunk_embeddings, best, top_k)
+        kept = [ids.index(bullet_id) for bullet_id in keep if bullet_id in ids] if len(chunk_embeddings) else []
+        for row in kept:
+            best[row] = max(best.get(row, -1.0), float(np.max(chunk_embeddings @ embeddings[row])))
+        matches, best_score = ranked_matches(best, ids, texts, thresholds, top_k)
+        listed = {match["index"] for match in matches}
+        matches += [
+            {"index": row, "id": ids[row], "text": texts[row], "score": best[row]}
+            for row in kept
+            if row not in listed and best[row] >= thresholds[row]
+        ]
+        return matches, best_score
+
+    def stats(self):
+        """Returns chunk counts for the current session."""
+        return {
+            "utterances": self.utterances,
+            "encoded": self.encoded,
+            "reused": self.reused,
+            "accumulated": len(self.best),
+        }
+
+class MatchExecutor:
+    """Runs similarity matching on a worker pool instead of the event loop.
+
+    Only the latest transcript per session is kept: a newer transcript replaces
+    one that is still waiting, and marks an in-flight job stale so its result
+    is dropped and a job that has not started encoding yet is skipped. The
+    number of sessions waiting is bounded by max_pending; the oldest waiting
+    transcript is dropped when the bound is hit.
+
+    Final utterance texts are queued separately from realtime partials, so a
+    partial of the next utterance never replaces a final. Finals are
+    dispatched first and are the last to be dropped.
+    """
+
+    def __init__(self, workers=MATCH_WORKERS, max_pending=MATCH_QUEUE_SIZE):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='match')
+        self.pending = OrderedDict()  # (client, final) -> (generation, text, received_at), oldest first
+        self.generations = {}  # (client, final) -> generation of its newest transcript
+        self.running = set()  # (client, final) keys with a job on the pool
+        self.submitted = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.stale = 0
+        self.completed = 0
+
+    def submit(self, client, text, received_at=None, final=False):
+        """Queues the latest transcript for a client. Must be called on the event loop."""
+        key = (client, final)
+        generation = self.generations.get(key, 0) + 1
+        self.generations[key] = generation
+        self.submitted += 1
+        if key in self.pending:
+            self.coalesced += 1
+        elif len(self.pending) >= self.max_pending:
+            partials = [waiting for waiting in self.pending if not waiting[1]]
+            self.pending.pop(partials[0] if partials else next(iter(self.pending)))
+            self.dropped += 1
+        self.pending[key] = (generation, text, received_at or time.perf_counter())
+        self._dispatch()
+
+    def discard(self, client):
+        """Forgets a client, dropping its waiting and in-flight work."""
+        for key in ((client, False), (client, True)):
+            self.pending.pop(key, None)
+            self.generations.pop(key, None)
+
+    def _is_stale(self, key, generation):
+        return self.generations.get(key) != generation
+
+    def _dispatch(self):
+        loop = asyncio.get_event_loop()
+        # Finals first; sorted() keeps arrival order within each kind
+        for key in sorted(self.pending, key=lambda waiting: not waiting[1]):
+            if len(self.running) >= self.workers:
+                break
+            if key in self.running:
+                continue
+            generation, text, received_at = self.pending.pop(key)
+            self.running.add(key)
+            future = loop.run_in_executor(self.pool, self._run, key, generation, text)
+            future.add_done_callback(
+                lambda f, k=key, g=generation, r=received_at: self._finished(f, k, g, r)
+            )
 
-def get_difference(prev: str, new: str) -> str:
-    """Removes the common starting portion from new relative to prev."""
-    prev_words = prev.split()
-    new_words = new.split()
-    i = 0
-    while i < min(len(prev_words), len(new_words)) and prev_words[i] == new_words[i]:
-        i += 1
-    return ' '.join(new_words[i:])
+    def _run(self, key, generation, text):
+        # A newer transcript arrived while this one was waiting for a worker
+        if self._is_stale(key, generation):
+            return None
+        client, final = key
+        return client.find_best_match(text, final=final)
 
-def process_text(text, websocket):
-    global total_word_count, last_transcribed_text, full_transcript
+    def _finished(self, future, key, generation, received_at):
+        self.running.discard(key)
+        client, final = key
+        try:
+            result = future.result()
+            if result is None or self._is_stale(key, generation):
+                self.stale += 1
+            else:
+                self.completed += 1
+                matches, score = result
+                if matches:
+                    logger.info("%s match: '%s' (Score: %.2f)", "Final" if final else "Provisional",
+                                matches[0]['text'], score,
+                                extra={'fields': {'session': client.id, 'score': score, 'final': final}})
+                if matches or final:
+                    # Put result in another queue to be sent by the main loop; finals are sent even
+                    # without a match so a provisional hint can be retracted
+                    similarity_queue.put_nowait((client, matches, received_at, final))
+        except Exception as e:
+            logger.error("Error in match worker: %s", e)
+        self._dispatch()
+
+    def stats(self):
+        """Returns queueing counters for the match pipeline."""
+        return {
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "stale": self.stale,
+            "completed": self.completed,
+            "pending": len(self.pending),
+            "running": len(self.running),
+        }
 
-    if recording and text:
-        # Step 1: Normalize by removing dots
-        cleaned = strip_dots_and_spaces(text)
-        last_cleaned = strip_dots_and_spaces(last_transcribed_text)
+    def shutdown(self):
+        """Stops the worker pool without waiting for in-flight matches."""
+        self.pending.clear()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+class LatencyCounter:
+    """Running count, mean and max of a latency plus rolling percentiles, reported in milliseconds.
+
+    The last `window` samples are kept in a ring buffer, so percentiles
+    follow recent behaviour rather than the whole session.
+    """
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.lock = threading.Lock()
+        self.samples = np.zeros(window, dtype=np.float64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples[self.count % len(self.samples)] = seconds
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            self.last = seconds
+
+    def percentiles(self):
+        """Returns {percentile: seconds} over the rolling window."""
+        with self.lock:
+            recent = self.samples[:min(self.count, len(self.samples))].copy()
+        if not len(recent):
+            return {p: 0.0 for p in LATENCY_PERCENTILES}
+        return dict(zip(LATENCY_PERCENTILES, np.percentile(recent, LATENCY_PERCENTILES).tolist()))
+
+    def stats(self):
+        stats = {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "max_ms": self.max * 1000,
+            "last_ms": self.last * 1000,
+        }
+        for p, seconds in self.percentiles().items():
+            stats[f"p{p}_ms"] = seconds * 1000
+        return stats
+
+# Per-stage latencies of the audio -> transcript -> match pipeline
+pipeline_latency = {
+    "frame_ingest": LatencyCounter(),  # Binary frame received -> PCM ready for the recorder
+    "feed_audio": LatencyCounter(),  # recorder.feed_audio call
+    "stabilized_callback": LatencyCounter(),  # Stabilized realtime text handed to the session -> callback returned
+    "transcript_delivery": LatencyCounter(),  # Recorder callback -> transcription queue consumer
+    "match": LatencyCounter(),  # Encode and rank on a match worker
+    "send": LatencyCounter(),  # websocket send of a single message
+    "match_delivery": LatencyCounter(),  # Recorder callback -> match_result sent
+}
+transcript_delivery_latency = pipeline_latency["transcript_delivery"]
+match_delivery_latency = pipeline_latency["match_delivery"]
+
+def latency_stats():
+    """Returns every pipeline stage's latency statistics."""
+    return {stage: counter.stats() for stage, counter in pipeline_latency.items()}
+
+def prometheus_metrics():
+    """Renders the pipeline latencies and queue counters in the Prometheus text format."""
+    lines = [
+        "# HELP transcription_stage_latency_seconds Latency of each pipeline stage over the rolling window",
+        "# TYPE transcription_stage_latency_seconds summary",
+    ]
+    for stage, counter in pipeline_latency.items():
+        for p, seconds in counter.percentiles().items():
+            lines.append(f'transcription_stage_latency_seconds{{stage="{stage}",quantile="{p / 100}"}} {seconds:.6f}')
+        lines.append(f'transcription_stage_latency_seconds_sum{{stage="{stage}"}} {counter.total:.6f}')
+        lines.append(f'transcription_stage_latency_seconds_count{{stage="{stage}"}} {counter.count}')
+    lines.append("# TYPE transcription_sessions gauge")
+    lines.append(f"transcription_sessions {len(sessions)}")
+    lines.append("# TYPE transcription_audio_lag_ms gauge")
+    for session in list(sessions):
+        lines.append(f'transcription_audio_lag_ms{{session="{session.id}"}} {session.audio_buffer.lag_ms():.1f}')
+    lines.append("# TYPE transcription_audio_dropped_total counter")
+    for session in list(sessions):
+        buffer = session.audio_buffer
+        lines.append(f'transcription_audio_dropped_total{{session="{session.id}",kind="silence"}} {buffer.dropped_silence}')
+        lines.append(f'transcription_audio_dropped_total{{session="{session.id}",kind="speech"}} {buffer.dropped_speech}')
+    if match_executor is not None:
+        lines.append("# TYPE transcription_matcher_total counter")
+        for name, value in match_executor.stats().items():
+            if name not in ("pending", "running"):
+                lines.append(f'transcription_matcher_total{{event="{name}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+async def serve_metrics(reader, writer):
+    """Answers any HTTP request with the Prometheus metrics page."""
+    try:
+        # Only the request line and headers are read; the path is not checked
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        body = prometheus_metrics().encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/plain; version=0.0.4\r\n"
+            + f"Content-Length: {len(body)}\r\n".encode()
+            + b"Connection: close\r\n\r\n"
+            + body
+        )
+        await writer.drain()
+    except Exception as e:
+        logger.error("Error serving metrics: %s", e)
+    finally:
+        writer.close()
 
-        # Step 4: If it's exactly the same, skip
-        if cleaned == last_cleaned:
-            print(f"Ignored duplicate transcript: '{cleaned}'")
-            return
+def post_transcription(session, text):
+    """Hands a transcript from a recorder thread to the event loop's queue."""
+    loop = main_loop
+    if loop is None or loop.is_closed():
+        return
+    loop.call_soon_threadsafe(transcription_queue.put_nowait, (session, text, time.perf_counter()))
 
-        # Step 2: Extract the difference
-        difference = get_difference(last_cleaned, cleaned)
+def post_coverage(session):
+    """Tells a session's client about coverage changed on a match worker."""
+    loop = main_loop
+    if loop is None or loop.is_closed():
+        return
+    loop.call_soon_threadsafe(lambda: loop.create_task(session.send_coverage()))
 
-        # Step 3: Count and update
-        added_words = len(difference.split())
-        total_word_count += added_words
+def post_final_transcription(session, text):
+    """Hands an utterance's final text from a recorder thread to the match workers."""
+    loop = main_loop
+    if loop is None or loop.is_closed():
+        return
+    loop.call_soon_threadsafe(match_executor.submit, session, text, time.perf_counter(), True)
+
+# Record layouts of protocol 2 'binary' frames, little-endian, concatenated in one frame per tick
+RECORD_AUDIO_ACK = 1
+RECORD_MATCH_RESULT = 2
+RECORD_MATCH_PROVISIONAL = 3
+RECORD_MATCH_FINAL = 4
+AUDIO_ACK_RECORD = struct.Struct('<BII')  # kind, frames and samples received since the last ack
+MATCH_HEADER = struct.Struct('<BB')  # kind, number of ranked matches that follow
+FINAL_HEADER = struct.Struct('<BBB')  # kind, index into MATCH_STATUSES, number of ranked matches
+MATCH_ENTRY = struct.Struct('<fB')  # score, length of the UTF-8 bullet id that follows
+
+def common_prefix_length(a, b):
+    """Length of the longest common prefix of two strings."""
+    if b.startswith(a):
+        return len(a)
+    limit = min(len(a), len(b))
+    i = 0
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+class Outbox:
+    """Outbound buffer for one session on protocol 2 or later.
+
+    Transcripts are sent as deltas against the text the client already has
+    ({"offset", "text"}: keep the first offset characters, append text), and
+    everything queued within one tick goes out as a single "batch" frame.
+    Several transcripts in one tick collapse into one delta. With the
+    'binary' encoding, match results and audio acks go in a separate binary
+    frame of fixed-layout records instead.
+    """
+
+    def __init__(self, websocket, encoding='json', tick=OUTBOUND_TICK):
+        self.websocket = websocket
+        self.encoding = encoding
+        self.tick = tick
+        self.sent_text = ""  # Transcript text the client holds
+        self.pending_text = None
+        self.messages = []
+        self.records = bytearray()
+        self.match_times = []  # received_at of each queued match, for match_delivery latency
+        self.audio_frames = 0
+        self.audio_samples = 0
+        self.handle = None
+        self.closed = False
+
+    def transcript(self, text):
+        self.pending_text = text
+        self._schedule()
+
+    def match(self, message, received_at):
+        """Queues a match_result or match_provisional message built by the session."""
+        if self.encoding == 'binary':
+            matches = message["matches"]
+            if message["type"] == "match_provisional":
+                self.records += MATCH_HEADER.pack(RECORD_MATCH_PROVISIONAL, len(matches))
+            elif message.get("final"):
+                self.records += FINAL_HEADER.pack(RECORD_MATCH_FINAL, MATCH_STATUSES.index(message["status"]), len(matches))
+            else:
+                self.records += MATCH_HEADER.pack(RECORD_MATCH_RESULT, len(matches))
+            for match in matches:
+                bullet_id = str(match["id"]).encode("utf-8")[:255]
+                self.records += MATCH_ENTRY.pack(match["score"], len(bullet_id))
+                self.records += bullet_id
+        else:
+            self.messages.append(message)
+        self.match_times.append(received_at)
+        self._schedule()
+
+    def audio(self, samples):
+        """Counts an ingested frame; acknowledged with the next flush."""
+        self.audio_frames += 1
+        self.audio_samples += samples
+        self._schedule()
+
+    def message(self, message_type, data):
+        self.messages.append({"type": message_type, **data})
+        self._schedule()
+
+    def _schedule(self):
+        if self.handle is None and not self.closed:
+            loop = asyncio.get_running_loop()
+            self.handle = loop.call_later(self.tick, lambda: loop.create_task(self.flush()))
+
+    async def flush(self):
+        """Sends everything queued since the last tick."""
+        self.handle = None
+        if self.closed:
+            return
+        if self.pending_text is not None and self.pending_text != self.sent_text:
+            offset = common_prefix_length(self.sent_text, self.pending_text)
+            self.messages.insert(0, {
+                "type": "transcript_delta",
+                "offset": offset,
+                "text": self.pending_text[offset:],
+            })
+            self.sent_text = self.pending_text
+        self.pending_text = None
+        if self.audio_frames:
+            if self.encoding == 'binary':
+                self.records += AUDIO_ACK_RECORD.pack(RECORD_AUDIO_ACK, self.audio_frames, self.audio_samples)
+            else:
+                self.messages.append({"type": "audio_ack", "frames": self.audio_frames, "samples": self.audio_samples})
+            self.audio_frames = self.audio_samples = 0
+        messages, self.messages = self.messages, []
+        records, self.records = self.records, bytearray()
+        match_times, self.match_times = self.match_times, []
+        try:
+            start_time = time.perf_counter()
+            if messages:
+                await self.websocket.send(json.dumps({"type": "batch", "messages": messages}))
+            if records:
+                await self.websocket.send(bytes(records))
+            sent_at = time.perf_counter()
+            pipeline_latency["send"].record(sent_at - start_time)
+            for received_at in match_times:
+                match_delivery_latency.record(sent_at - received_at)
+        except websockets.exceptions.ConnectionClosed:
+            logger.warning("Connection closed while sending a batch")
+        except Exception as e:
+            logger.error("Error sending batch: %s", e)
 
-        # Update the full transcript and log it
-        full_transcript += " " + difference  # Append the new cleaned text
-        print(f"Updated full transcript: '{full_transcript.strip()}'")  # Log the full transcript
+    def reset_transcript(self):
+        """The client starts a new transcript; the next delta is against empty text."""
+        self.sent_text = ""
 
-        transcription_queue.put((websocket, text))
-        last_transcribed_text = cleaned  # Store original, not cleaned
+    def close(self):
+        self.closed = True
+        if self.handle:
+            self.handle.cancel()
+            self.handle = None
 
 async def process_transcription_queue():
     """Process transcription updates from the queue and perform matching"""
     while True:
         try:
-            # Process transcriptions in batches if available
-            latest_texts = {} # Store latest text per websocket
+            # Sleep until a transcript arrives, then drain whatever else is already queued
+            latest_texts = {} # Store latest text per session
+            session, text, received_at = await transcription_queue.get()
+            latest_texts[session] = (text, received_at)
             while not transcription_queue.empty():
-                websocket, text = transcription_queue.get_nowait()
-                latest_texts[websocket] = text # Keep only the latest
-
-            # Process the latest transcription for each active websocket
-            for websocket, text in latest_texts.items():
-                # Send the latest transcription immediately
-                await send_message(websocket, "transcription", {"text": text})
-
-                # Perform similarity matching
-                match, score = find_best_match(text)
-                # print(f"User just said: '{text[:50]}...'")
-                if match:
-                    print(f"Match found: '{match}' (Score: {score:.2f}) for transcript: '{text[:50]}...'")
-                    # Put result in another queue to be sent by the main loop
-                    similarity_queue.put((websocket, match, score))
-                # else:
-                #     # Add debug logging for when no match is found but we have bullets
-                #     if bullet_points and len(bullet_points) > 0:
-                #         print(f"No match found (Score: {score:.2f}) for transcript: '{text[:50]}...'")
-                #         print(f"Current bullet points ({len(bullet_points)}): {', '.join(bullet_points[:3])}{'...' if len(bullet_points) > 3 else ''}")
-                #     # logging.debug(f"No match found (Score: {score:.2f}) for transcript: '{text[:50]}...'")
+                session, text, received_at = transcription_queue.get_nowait()
+                latest_texts[session] = (text, received_at) # Keep only the latest
+
+            # Process the latest transcription for each active session
+            for session, (text, received_at) in latest_texts.items():
+                if session.closed:
+                    continue
+                transcript_delivery_latency.record(time.perf_counter() - received_at)
+                # Send the latest transcription immediately, or with the next batch on protocol 2
+                await session.send_transcript(text)
 
+                # Hand similarity matching to the worker pool; results land in similarity_queue
+                match_executor.submit(session, text, received_at)
+
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             logging.error(f"Error processing transcription queue: {e}")
 
-        # Small delay to avoid tight loop
-        await asyncio.sleep(0.05) # Slightly longer delay, matching is heavier
-
 async def process_similarity_queue():
     """ Sends similarity results from the queue """
     while True:
         try:
-            # Send all available similarity results
-            while not similarity_queue.empty():
-                websocket, match, score = similarity_queue.get_nowait()
-                await send_message(websocket, "match_result", {"match": match, "score": float(score)})
+            # Wait for a result instead of polling
+            session, matches, received_at, final = await similarity_queue.get()
+            if session.closed:
+                continue
+            await session.send_match(matches, received_at, final)
 
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             logging.error(f"Error processing similarity queue: {e}")
 
-        await asyncio.sleep(0.01) # Check frequently
+# Custom AudioToTextRecorder class, defined on first use so RealtimeSTT is only imported when a recorder is needed
+CustomAudioToTextRecorder = None
+
+def load_recorder_class():
+    """Imports RealtimeSTT and defines CustomAudioToTextRecorder the first time it's needed"""
+    global CustomAudioToTextRecorder
+    if CustomAudioToTextRecorder is not None:
+        return CustomAudioToTextRecorder
+    from RealtimeSTT import AudioToTextRecorder
+
+    # Custom AudioToTextRecorder class that properly handles shutdown. RealtimeSTT never calls a
+    # poll_connection on the recorder itself: the loop polling the transcription pipe belongs to
+    # TranscriptionWorker in the child process, so overriding it here would have no effect
+    class CustomAudioToTextRecorder(AudioToTextRecorder):
+        def shutdown(self):
+            """Properly shut down the recorder"""
+            try:
+                super().shutdown()
+            except Exception as e:
+                logger.error("Error in custom shutdown: %s", e)
 
-# Custom AudioToTextRecorder class that properly handles shutdown
-class CustomAudioToTextRecorder(AudioToTextRecorder):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._stop_poll = False
-    
-    def poll_connection(self):
-        """Override the poll_connection method to respect the stop flag"""
+    return CustomAudioToTextRecorder
+
+def create_recorder():
+    """Creates and loads a new recorder, or returns None if it fails"""
+    try:
+        recorder = load_recorder_class()(
+            spinner=False,
+            model=RECORDER_MODEL,
+            use_main_model_for_realtime=True,
+            compute_type=RECORDER_COMPUTE_TYPE,
+            language='en',
+            silero_sensitivity=0.6,
+            webrtc_sensitivity=2,
+            # How long must I hear silence before I decide your utterance is finished and kick off a final transcription?
+            post_speech_silence_duration=0.2,
+            # Once I’ve finalized one utterance, how long of continuous silence before I’ll even start listening for a new one?
+            min_gap_between_recordings=0.3,
+            # Can I get a quick, provisional transcription as soon as any silence is detected—even 
+            # before the full post_speech_silence_duration has passed?
+            # early_transcription_on_silence=50,
+            min_length_of_recording=1.5,
+            enable_realtime_transcription=True,
+            # Reduce processing pause for more frequent updates
+            realtime_processing_pause=0.02,
+            silero_deactivity_detection=False,
+            beam_size=RECORDER_BEAM_SIZE,
+            beam_size_realtime=1,
+            debug_mode=True,
+            no_log_file=True,
+            use_microphone=RECORDER_USE_MICROPHONE,
+        )
+        print("Recorder initialized successfully")
+        warm_up_recorder(recorder)
+        return recorder
+    except Exception as e:
+        logger.error("Error initializing recorder: %s", e)
+        return None
+
+def warm_up_recorder(recorder):
+    """Transcribes a short stretch of silence so the first real utterance doesn't pay for model start-up."""
+    start_time = time.perf_counter()
+    try:
+        recorder.audio = np.zeros(int(RECORDER_SAMPLE_RATE * RECORDER_WARMUP_SECONDS), dtype=np.float32)
+        recorder.transcribe()
+        logger.info("Recorder warm-up inference took %.0f ms", (time.perf_counter() - start_time) * 1000)
+    except Exception as e:
+        # Not fatal: the first utterance just takes longer
+        logger.warning("Recorder warm-up failed: %s", e)
+    finally:
+        recorder.audio = None
+
+class RecorderWorker:
+    """Long-lived thread that runs recorder.text() for whichever session holds the recorder.
+
+    The thread lives as long as the recorder. A session resumes it with its
+    own callbacks; pausing detaches them and turns the microphone off but
+    keeps the model loaded, so the next resume captures right away.
+
+    An utterance belongs to the session that held the recorder when its
+    recording started (or when text() was called, if it never did). text()
+    may still be finishing one when the worker pauses; its final text is
+    dropped unless that same resume is still current, so it never reaches
+    the next holder.
+    """
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+        use_microphone = getattr(recorder, 'use_microphone', False)
+        # RealtimeSTT keeps the flag in a multiprocessing Value
+        self.uses_microphone = bool(getattr(use_microphone, 'value', use_microphone))
+        self.active = threading.Event()
+        self.closed = False
+        self.on_stabilized = None
+        self.on_final = None
+        # One-item list holding on_final of the holder the pending utterance belongs to
+        self.utterance_owner = [None]
+        self.resumes = 0
+        recorder.on_recording_start = self._recording_started
+        self._set_microphone(False)
+        self.thread = threading.Thread(target=self._run, name='recorder', daemon=True)
+        self.thread.start()
+
+    def _set_microphone(self, on):
+        if self.uses_microphone and hasattr(self.recorder, 'set_microphone'):
+            self.recorder.set_microphone(on)
+
+    def resume(self, on_stabilized, on_final):
+        """Attaches a session's callbacks and starts capturing."""
+        if hasattr(self.recorder, 'clear_audio_queue'):
+            # Audio left from the previous holder must not end up in this session's transcript
+            self.recorder.clear_audio_queue()
+        self.on_stabilized = on_stabilized
+        self.on_final = on_final
+        self.recorder.on_realtime_transcription_stabilized = self._deliver_stabilized
+        self._set_microphone(True)
+        self.resumes += 1
+        self.active.set()
+
+    def pause(self):
+        """Stops delivering text and listening, keeping the model loaded."""
+        self.active.clear()
+        self.recorder.on_realtime_transcription_stabilized = None
+        self.on_stabilized = None
+        self.on_final = None
+        self._set_microphone(False)
+
+    def close(self):
+        """Lets the thread exit; call before shutting the recorder down."""
+        self.closed = True
+        self.pause()
+        self.active.set()
+
+    def _deliver_stabilized(self, text):
+        # RealtimeSTT runs this through _run_callback, on a new thread per update
+        callback = self.on_stabilized
+        if callback:
+            start_time = time.perf_counter()
+            callback(text)
+            pipeline_latency["stabilized_callback"].record(time.perf_counter() - start_time)
+
+    def _recording_started(self):
+        self.utterance_owner[0] = self.on_final
+
+    def _deliver_final(self, owner, text):
+        # Bound methods are compared by identity, so a later resume of the same session doesn't match either
+        if owner is not None and owner is self.on_final:
+            owner(text)
+
+    def _run(self):
+        while True:
+            self.active.wait()
+            if self.closed:
+                break
+            # A new list per call: RealtimeSTT runs the callback on its own thread, maybe after the next call starts
+            owner = self.utterance_owner = [self.on_final]
+            try:
+                # Realtime updates arrive via on_realtime_transcription_stabilized; the final
+                # beam-search text of each utterance settles the provisional matches
+                self.recorder.text(lambda text: self._deliver_final(owner[0], text))
+            except Exception as e:
+                if not self.closed and not shutdown_in_progress:  # Only log if not shutting down
+                    logger.error("Error in recording iteration: %s", e)
+                time.sleep(0.1)
+        logger.debug("Recording thread ended")
+
+class ModelPool:
+    """Recorders shared by every session.
+
+    The embedding model is the module-level global, loaded once at startup
+    and used by all sessions without leasing. A recorder
+    owns a single audio stream, so each recording session leases one; a
+    released recorder stays loaded in the pool and the next session reuses it
+    without reloading tiny.en. New recorders are only created when every
+    loaded one is leased.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.idle_recorders = []
+        self.leased_recorders = set()
+        self.recorders_created = 0
+
+    def _create(self):
+        recorder = create_recorder()
+        if recorder is not None:
+            recorder.worker = RecorderWorker(recorder)
+            with self.lock:
+                self.recorders_created += 1
+        return recorder
+
+    def prewarm_recorder(self):
+        """Loads one idle recorder up front so the first session doesn't wait for it."""
+        with self.lock:
+            if self.idle_recorders:
+                return True
+        recorder = self._create()
+        if recorder is None:
+            return False
+        with self.lock:
+            self.idle_recorders.append(recorder)
+        return True
+
+    def acquire_recorder(self):
+        """Leases an idle recorder, loading a new one if all are in use. Blocks while loading."""
+        with self.lock:
+            if self.idle_recorders:
+                recorder = self.idle_recorders.pop()
+                self.leased_recorders.add(recorder)
+                return recorder
+        recorder = self._create()
+        if recorder is not None:
+            with self.lock:
+                self.leased_recorders.add(recorder)
+        return recorder
+
+    def release_recorder(self, recorder):
+        """Returns a leased recorder to the idle pool, keeping its model loaded."""
+        recorder.worker.pause()
+        with self.lock:
+            # Recorders shut down while leased are not returned
+            if recorder in self.leased_recorders:
+                self.leased_recorders.discard(recorder)
+                self.idle_recorders.append(recorder)
+
+    def shutdown_recorders(self):
+        """Shuts down every recorder, idle or leased. Returns how many were shut down."""
+        with self.lock:
+            recorders = self.idle_recorders + list(self.leased_recorders)
+            self.idle_recorders = []
+            self.leased_recorders = set()
+        for recorder in recorders:
+            try:
+                # Detach callbacks and let the recording thread exit
+                recorder.worker.close()
+                recorder.shutdown()
+            except Exception as e:
+                logger.error("Error during recorder shutdown: %s", e)
+        return len(recorders)
+
+    def stats(self):
+        """Returns idle, leased and created recorder counts."""
+        with self.lock:
+            return {
+                "recorders_idle": len(self.idle_recorders),
+                "recorders_leased": len(self.leased_recorders),
+                "recorders_created": self.recorders_created,
+            }
+
+def initialize_recorder():
+    """Pre-loads a recorder into the pool so the first client can start immediately"""
+    return model_pool.prewarm_recorder()
+
+class AudioIngest:
+    """Turns incoming audio frames into the 16 kHz int16 PCM the recorder consumes.
+
+    16 kHz int16 frames are handed straight through. Float32 frames and other
+    sample rates are scaled and linearly resampled into preallocated buffers,
+    so steady-state frames allocate nothing; `allocations` counts how often a
+    buffer had to be (re)allocated.
+    """
+
+    def __init__(self, sample_rate=RECORDER_SAMPLE_RATE, sample_format='int16'):
+        if sample_format not in AUDIO_FORMATS:
+            raise ValueError(f"Unsupported audio format: {sample_format}")
+        if int(sample_rate) <= 0:
+            raise ValueError(f"Invalid sample rate: {sample_rate}")
+        self.sample_rate = int(sample_rate)
+        self.sample_format = sample_format
+        self.dtype = np.dtype(np.int16 if sample_format == 'int16' else np.float32)
+        self.passthrough = sample_format == 'int16' and self.sample_rate == RECORDER_SAMPLE_RATE
+        # Resample in blocks of block_in input samples -> block_out output samples
+        divisor = math.gcd(self.sample_rate, RECORDER_SAMPLE_RATE)
+        self.block_in = self.sample_rate // divisor
+        self.block_out = RECORDER_SAMPLE_RATE // divisor
+        self.pending = 0  # Input samples carried over to the next frame
+        self.frames = 0
+        self.samples = 0
+        self.allocations = 0
+        self.latency = LatencyCounter()
+        if not self.passthrough:
+            self._allocate(INGEST_BUFFER_SAMPLES)
+
+    def _allocate(self, capacity):
+        """Allocates working buffers for frames of up to `capacity` samples."""
+        carried = self.input[:self.pending].copy() if self.pending else None
+        self.capacity = capacity
+        total = capacity + self.block_in + 1
+        self.input = np.zeros(total, dtype=np.float32)
+        if carried is not None:
+            self.input[:len(carried)] = carried
+        max_out = total // self.block_in * self.block_out
+        # Fixed interpolation positions: every call starts on a block boundary
+        positions = np.arange(max_out, dtype=np.float64) * self.block_in / self.block_out
+        self.left_index = np.floor(positions).astype(np.intp)
+        self.right_index = self.left_index + 1
+        self.right_weight = (positions - self.left_index).astype(np.float32)
+        self.left = np.empty(max_out, dtype=np.float32)
+        self.right = np.empty(max_out, dtype=np.float32)
+        self.output = np.empty(max(max_out, total), dtype=np.int16)
+        self.allocations += 1
+
+    def ingest(self, message):
+        """Returns recorder-ready PCM for one frame.
+
+        The result is either the frame itself or a view into a reused buffer,
+        so it must be consumed (feed_audio copies it) before the next call.
+        """
+        start_time = time.perf_counter()
+        if len(message) % self.dtype.itemsize:
+            raise ValueError(f"Audio frame of {len(message)} bytes is not a whole number of {self.sample_format} samples")
+        self.frames += 1
+        if self.passthrough:
+            self.samples += len(message) // 2
+            self.latency.record(time.perf_counter() - start_time)
+            return message
+
+        frame = np.frombuffer(message, dtype=self.dtype)  # A view, not a copy
+        n = len(frame)
+        if n > self.capacity:
+            self._allocate(n)
+        dest = self.input[self.pending:self.pending + n]
+        if self.sample_format == 'float32':
+            np.multiply(frame, 32767.0, out=dest)
+            np.clip(dest, -32768.0, 32767.0, out=dest)
+        else:
+            np.copyto(dest, frame)
+        available = self.pending + n
+
+        if self.block_in == self.block_out:
+            # Same rate: only the format changes
+            count = available
+            np.rint(self.input[:count], out=self.input[:count])
+            np.copyto(self.output[:count], self.input[:count], casting='unsafe')
+            self.pending = 0
+        else:
+            # Keep one sample past the last whole block for the interpolation
+            blocks = (available - 1) // self.block_in
+            count = blocks * self.block_out
+            left, right = self.left[:count], self.right[:count]
+            np.take(self.input, self.left_index[:count], out=left)
+            np.take(self.input, self.right_index[:count], out=right)
+            np.subtract(right, left, out=right)
+            np.multiply(right, self.right_weight[:count], out=right)
+            np.add(left, right, out=left)
+            np.rint(left, out=left)
+            np.copyto(self.output[:count], left, casting='unsafe')
+            consumed = blocks * self.block_in
+            self.pending = available - consumed
+            if consumed:
+                # consumed >= pending here, so the ranges never overlap
+                self.input[:self.pending] = self.input[consumed:available]
+
+        self.samples += count
+        self.latency.record(time.perf_counter() - start_time)
+        return memoryview(self.output[:count]).cast('B')
+
+    def stats(self):
+        """Returns frame counts, buffer allocations and per-frame ingest time."""
+        return {
+            "sample_rate": self.sample_rate,
+            "format": self.sample_format,
+            "passthrough": self.passthrough,
+            "frames": self.frames,
+            "output_samples": self.samples,
+            "allocations": self.allocations,
+            "ingest_time": self.latency.stats(),
+        }
+
+class AudioBuffer:
+    """Bounded hold-back buffer between the websocket and a recorder's feed_audio.
+
+    Frames go straight to the recorder while its audio queue is short. Once
+    the queue passes RECORDER_QUEUE_LIMIT chunks, frames are held here, up
+    to max_ms of audio. When that is full the drop policy makes room. A
+    frame counts as silence when its RMS is below AUDIO_SILENCE_RMS.
+    Crossing FLOW_CONTROL_HIGH or FLOW_CONTROL_LOW of the buffer returns a
+    flow-control action for the client.
+    """
+
+    def __init__(self, max_ms=None, policy=None):
+        max_ms = AUDIO_BUFFER_MS if max_ms is None else max_ms
+        policy = policy or AUDIO_DROP_POLICY
+        if policy not in AUDIO_DROP_POLICIES:
+            raise ValueError(f"Unknown audio drop policy '{policy}'")
+        self.policy = policy
+        self.max_samples = RECORDER_SAMPLE_RATE * max_ms // 1000
+        self.frames = deque()  # (pcm bytes, samples, silent, received_at), oldest first
+        self.buffered = 0  # Samples held in frames
+        self.depth = 0  # Last seen recorder queue depth, in chunks
+        self.depth_supported = True
+        self.throttled = False
+        self.fed = 0
+        self.held = 0
+        self.dropped_silence = 0
+        self.dropped_speech = 0
+        self.hold_time = LatencyCounter()  # Frame received -> fed to the recorder
+
+    def recorder_depth(self, recorder):
+        # multiprocessing queues have no qsize() on macOS; frames are then never held back
+        if self.depth_supported:
+            try:
+                self.depth = recorder.audio_queue.qsize()
+            except (NotImplementedError, AttributeError):
+                self.depth_supported = False
+                self.depth = 0
+        return self.depth
+
+    def push(self, recorder, pcm, received_at):
+        """Feeds or buffers one frame of 16 kHz int16 PCM; returns 'slow_down', 'resume' or None."""
+        if not self.frames and self.recorder_depth(recorder) < RECORDER_QUEUE_LIMIT:
+            recorder.feed_audio(pcm)
+            self.fed += 1
+            self.hold_time.record(time.perf_counter() - received_at)
+            return self.flow_control()
+        samples = len(pcm) // 2
+        silent = self.is_silent(pcm)
+        if self.buffered + samples > self.max_samples and not self._make_room(samples, silent):
+            self._count_drop(silent)
+        else:
+            # The ingest buffer is reused for the next frame, so held frames need their own copy
+            self.frames.append((bytes(pcm), samples, silent, received_at))
+            self.buffered += samples
+            self.held += 1
+        self.drain(recorder)
+        return self.flow_control()
+
+    def drain(self, recorder):
+        """Feeds held frames while the recorder's queue has room; returns whether any are left."""
+        while self.frames and self.recorder_depth(recorder) < RECORDER_QUEUE_LIMIT:
+            pcm, samples, _, received_at = self.frames.popleft()
+            self.buffered -= samples
+            recorder.feed_audio(pcm)
+            self.fed += 1
+            self.hold_time.record(time.perf_counter() - received_at)
+        return bool(self.frames)
+
+    @staticmethod
+    def is_silent(pcm):
+        frame = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+        return not len(frame) or float(np.sqrt(np.mean(frame * frame))) < AUDIO_SILENCE_RMS
+
+    def _make_room(self, samples, silent):
+        """Drops held frames per the policy; returns False if the incoming frame should be dropped instead."""
+        if self.policy == 'newest':
+            return False
+        if self.policy == 'silence_first':
+            if silent:
+                return False
+            kept = deque()
+            for frame in self.frames:
+                if frame[2] and self.buffered + samples > self.max_samples:
+                    self.buffered -= frame[1]
+                    self._count_drop(True)
+                else:
+                    kept.append(frame)
+            self.frames = kept
+        while self.frames and self.buffered + samples > self.max_samples:
+            frame = self.frames.popleft()
+            self.buffered -= frame[1]
+            self._count_drop(frame[2])
+        return True
+
+    def _count_drop(self, silent):
+        if silent:
+            self.dropped_silence += 1
+        else:
+            self.dropped_speech += 1
+
+    def flow_control(self):
+        fill = self.buffered / self.max_samples if self.max_samples else 0.0
+        if not self.throttled and fill >= FLOW_CONTROL_HIGH:
+            self.throttled = True
+            return 'slow_down'
+        if self.throttled and fill <= FLOW_CONTROL_LOW:
+            self.throttled = False
+            return 'resume'
+        return None
+
+    def lag_ms(self):
+        """Audio waiting ahead of the recognizer: held frames plus the recorder's own queue."""
+        return (self.buffered + self.depth * RECORDER_CHUNK_SAMPLES) * 1000 / RECORDER_SAMPLE_RATE
+
+    def stats(self):
+        return {
+            "policy": self.policy,
+            "buffered_ms": self.buffered * 1000 / RECORDER_SAMPLE_RATE,
+            "capacity_ms": self.max_samples * 1000 / RECORDER_SAMPLE_RATE,
+            "held_frames": len(self.frames),
+            "recorder_queue": self.depth if self.depth_supported else None,
+            "lag_ms": self.lag_ms(),
+            "throttled": self.throttled,
+            "fed": self.fed,
+            "held": self.held,
+            "dropped_silence": self.dropped_silence,
+            "dropped_speech": self.dropped_speech,
+            "hold_time": self.hold_time.stats(),
+        }
+
+class StartupProfile:
+    """Structured startup timings.
+
+    Sequential steps are recorded with mark(); background loads that overlap
+    them are recorded with record(). Offsets are relative to profile creation.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.steps = []
+
+    def mark(self, name):
+        """Records a sequential step that ran from the previous mark until now."""
+        now = time.perf_counter()
+        self.record(name, self.last, now)
+        self.last = now
+
+    def record(self, name, started, ended):
+        """Records a step with explicit perf_counter start and end times."""
+        with self.lock:
+            self.steps.append({
+                "step": name,
+                "start_s": round(started - self.start, 3),
+                "duration_s": round(ended - started, 3),
+            })
+
+    def summary(self):
+        with self.lock:
+            return {
+                "elapsed_s": round(time.perf_counter() - self.start, 3),
+                "steps": list(self.steps),
+            }
+
+def set_component_status(name, status):
+    """Updates a component's load status and reports it to every connected client"""
+    component_status[name] = status
+    if status in ('ready', 'failed'):
+        component_events[name].set()
+    else:
+        # Reloading after a shutdown command: wait for the new load again
+        component_events[name].clear()
+    for session in list(sessions):
+        asyncio.create_task(send_message(session.websocket, "status", {"status": status, "component": name}))
+
+async def wait_for_component(name):
+    """Waits until a component has finished loading; returns True if it is ready"""
+    await component_events[name].wait()
+    return component_status[name] == 'ready'
+
+async def load_component(name, loader):
+    """Runs a blocking model loader on a worker thread and reports its progress"""
+    set_component_status(name, 'loading')
+    started = time.perf_counter()
+    try:
+        loaded = await asyncio.get_event_loop().run_in_executor(None, loader)
+    except Exception as e:
+        logger.error("Error loading %s: %s", name, e)
+        loaded = False
+    startup_profile.record(f"{name}_load", started, time.perf_counter())
+    set_component_status(name, 'ready' if loaded else 'failed')
+    return loaded
+
+async def load_components():
+    """Loads the embedding model and pre-warms a recorder in parallel"""
+    embedding_loaded, recorder_loaded = await asyncio.gather(
+        load_component('embedding', load_similarity_model),
+        load_component('recorder', initialize_recorder),
+    )
+    if not embedding_loaded:
+        logging.error("---CRITICAL---: Failed to load sentence similarity model. Matching will be disabled.")
+    if not recorder_loaded:
+        logger.error("---CRITICAL---: Failed to initialize recorder. Recording is unavailable until one loads.")
+    print(f"Startup profile: {json.dumps(startup_profile.summary())}")
+
+# --- Session Log ---
+# One index entry per fsync: durable transcript bytes, event bytes, word count and wall time
+SESSION_INDEX_ENTRY = struct.Struct('<QQQd')
+SESSION_KEY = re.compile(r'^[0-9a-f]{32}$')
+
+class SessionLog:
+    """Append-only on-disk record of one session, resumable after a crash or restart.
+
+    <key>.txt holds each utterance's final text as space-separated words,
+    <key>.jsonl one JSON event per line (matches, starts, stops, timings) and
+    <key>.idx a fixed-size entry per fsync with the byte lengths known to be
+    durable. Resuming reads the last index entry and the files up to the
+    lengths it records, without touching audio. Callers only queue records;
+    session_log_writer does the file work on its own thread.
+    """
+
+    def __init__(self, key, directory=None):
+        self.key = key
+        self.base = os.path.join(directory or SESSION_LOG_DIR, key)
+        self.text_bytes = 0
+        self.event_bytes = 0
+        self.word_count = 0
+        self.files = None  # Opened by the writer on the first record
+        self.dirty = False
+
+    @classmethod
+    def create(cls, directory=None):
+        return cls(uuid.uuid4().hex, directory)
+
+    def path(self, suffix):
+        return self.base + suffix
+
+    def exists(self):
+        return os.path.exists(self.path('.idx'))
+
+    def append_words(self, words):
+        """Queues words appended to the stored transcript."""
+        if words:
+            session_log_writer.put(self, 'words', words)
+
+    def record(self, event, **fields):
+        """Queues an event line; t is the wall-clock time it happened."""
+        fields["event"] = event
+        fields["t"] = time.time()
+        session_log_writer.put(self, 'event', fields)
+
+    def close(self):
+        session_log_writer.put(self, 'close', None)
+
+    def load(self):
+        """Restores the durable state; returns (transcript, events). Call before any record is queued.
+
+        Anything written after the last index entry may be torn, so the data
+        files are cut back to the indexed lengths before appending resumes.
+        """
+        last = None
+        with open(self.path('.idx'), 'rb') as index:
+            size = index.seek(0, os.SEEK_END)
+            size -= size % SESSION_INDEX_ENTRY.size
+            if size:
+                index.seek(size - SESSION_INDEX_ENTRY.size)
+                last = SESSION_INDEX_ENTRY.unpack(index.read(SESSION_INDEX_ENTRY.size))
+        # No entry yet means nothing was durable: everything in the data files is cut
+        self.text_bytes, self.event_bytes, self.word_count = last[:3] if last else (0, 0, 0)
+        for suffix, length in (('.txt', self.text_bytes), ('.jsonl', self.event_bytes)):
+            with open(self.path(suffix), 'r+b') as data:
+                data.truncate(length)
+        with open(self.path('.txt'), 'rb') as text:
+            transcript = text.read(self.text_bytes).decode('utf-8')
+        with open(self.path('.jsonl'), 'rb') as lines:
+            events = [json.loads(line) for line in lines.read(self.event_bytes).splitlines()]
+        return transcript, events
+
+    # The methods below run on the writer thread only
+
+    def _write(self, kind, payload):
+        if self.files is None:
+            os.makedirs(os.path.dirname(self.base), exist_ok=True)
+            self.files = {suffix: open(self.path(suffix), 'ab') for suffix in ('.txt', '.jsonl', '.idx')}
+        if kind == 'words':
+            data = ((" " if self.text_bytes else "") + " ".join(payload)).encode('utf-8')
+            self.files['.txt'].write(data)
+            self.text_bytes += len(data)
+            self.word_count += len(payload)
+        else:
+            data = (json.dumps(payload) + "\n").encode('utf-8')
+            self.files['.jsonl'].write(data)
+            self.event_bytes += len(data)
+        self.dirty = True
+
+    def _sync(self):
+        """Makes everything written so far durable, then indexes it."""
+        if not self.dirty:
+            return
+        for suffix in ('.txt', '.jsonl'):
+            self.files[suffix].flush()
+            os.fsync(self.files[suffix].fileno())
+        index = self.files['.idx']
+        index.write(SESSION_INDEX_ENTRY.pack(self.text_bytes, self.event_bytes, self.word_count, time.time()))
+        index.flush()
+        os.fsync(index.fileno())
+        self.dirty = False
+
+    def _close(self):
+        if self.files is not None:
+            self._sync()
+            for file in self.files.values():
+                file.close()
+            self.files = None
+
+class SessionLogWriter:
+    """Background thread that appends queued session log records and fsyncs them in batches.
+
+    The hot path only puts a tuple on a queue. Every fsync_interval the
+    writer syncs each log that changed, so a second of speech costs one
+    fsync per file instead of one per update.
+    """
+
+    def __init__(self, fsync_interval=SESSION_LOG_FSYNC_INTERVAL):
+        self.fsync_interval = fsync_interval
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+        self.start_lock = threading.Lock()
+        self.open_keys = set()  # Keys of logs owned by a live session
+        self.keys_lock = threading.Lock()
+        self.written = 0
+        self.syncs = 0
+        self.errors = 0
+
+    def claim(self, key):
+        """Marks a log as owned by a session; False if another session already has it."""
+        with self.keys_lock:
+            if key in self.open_keys:
+                return False
+            self.open_keys.add(key)
+            return True
+
+    def put(self, log, kind, payload):
+        if self.thread is None:
+            self._start()
+        self.queue.put((log, kind, payload))
+
+    def _start(self):
+        with self.start_lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="session-log", daemon=True)
+                self.thread.start()
+
+    def sync(self, timeout=5.0):
+        """Blocks until everything queued so far is on disk."""
+        if self.thread is None:
+            return True
+        done = threading.Event()
+        self.queue.put((None, 'sync', done))
+        return done.wait(timeout)
+
+    def _run(self):
+        dirty = set()
+        next_sync = time.monotonic() + self.fsync_interval
+        while True:
+            try:
+                log, kind, payload = self.queue.get(timeout=max(0.0, next_sync - time.monotonic()))
+            except queue.Empty:
+                log, kind, payload = None, None, None
+            try:
+                if kind == 'sync':
+                    self._sync_all(dirty)
+                    payload.set()
+                elif kind == 'close':
+                    log._close()
+                    dirty.discard(log)
+                    with self.keys_lock:
+                        self.open_keys.discard(log.key)
+                elif log is not None:
+                    log._write(kind, payload)
+                    dirty.add(log)
+                    self.written += 1
+            except Exception as e:
+                self.errors += 1
+                logger.error("Session log %s: %s", log.key if log else "-", e)
+            if time.monotonic() >= next_sync:
+                self._sync_all(dirty)
+                next_sync = time.monotonic() + self.fsync_interval
+
+    def _sync_all(self, dirty):
+        for log in list(dirty):
+            try:
+                log._sync()
+                self.syncs += 1
+            except Exception as e:
+                self.errors += 1
+                logger.error("Session log %s: %s", log.key, e)
+        dirty.clear()
+
+    def stats(self):
+        return {"written": self.written, "syncs": self.syncs, "errors": self.errors, "open": len(self.open_keys)}
+
+session_log_writer = SessionLogWriter()
+atexit.register(session_log_writer.sync)
+
+def prune_session_logs(directory=None, retention_days=SESSION_LOG_RETENTION_DAYS):
+    """Deletes session log files nobody has written to for retention_days."""
+    directory = directory or SESSION_LOG_DIR
+    if not directory or not os.path.isdir(directory):
+        return 0
+    cutoff = time.time() - retention_days * 86400
+    removed = 0
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
         try:
-            while not self._stop_poll:
-                try:
-                    if self.conn.poll(0.01):
-                        data = self.conn.recv()
-                        if isinstance(data, tuple):
-                            status, content = data
-                            if status == 'success':
-                                transcription, info = content
-                                if self.on_realtime_transcription_stabilized :
-                                    self.on_realtime_transcription_stabilized (transcription)
-                            elif status == 'error':
-                                logging.error(f"Error in transcription: {content}")
-                except (EOFError, BrokenPipeError) as e:
-                    if not self._stop_poll:  # Only log if not intentionally stopping
-                        logging.error(f"Connection error in poll_connection: {e}")
-                    break
-                except Exception as e:
-                    if not self._stop_poll:  # Only log if not intentionally stopping
-                        logging.error(f"Error in poll_connection: {e}")
-                    time.sleep(0.1)
-        except Exception as e:
-            if not self._stop_poll:  # Only log if not intentionally stopping
-                logging.error(f"Fatal error in poll_connection: {e}")
-        finally:
-            logging.debug("Poll connection thread ended")
-    
-    def shutdown(self):
-        """Properly shut down the recorder"""
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError as e:
+            logger.warning("Could not prune session log %s: %s", path, e)
+    return removed
+# --- End Session Log ---
+
+session_ids = itertools.count(1)
+
+class Session:
+    """Per-connection state: recorder lease, transcript, bullets and audio ingest.
+
+    Every websocket gets its own Session, so concurrent clients never share
+    transcript counters or bullet indexes and each recorder's callback is
+    bound to the session that leased it.
+    """
+
+    def __init__(self, websocket):
+        self.id = next(session_ids)
+        self.websocket = websocket
+        self.closed = False
+        self.recording = False
+        self.recorder = None
+        self.bullets = BulletStore()
+        self.bullet_updates = BulletUpdateDebouncer(self.bullets, self.send_bullets_updated)
+        # Clients that don't negotiate a format send 16 kHz int16 frames
+        self.audio_ingest = AudioIngest()
+        self.audio_buffer = AudioBuffer()
+        self.drain_handle = None
+        # Splits realtime text into chunks and keeps each bullet's best score per utterance
+        self.chunk_matcher = ChunkMatcher()
+        # Track total word count
+        self.total_word_count = 5
+        # Decides which transcript updates get matched
+        self.match_scheduler = MatchScheduler()
+        # Protocol 1 until the client negotiates otherwise with a hello message
+        self.protocol = 1
+        self.outbox = None
+        # Bullets covered before a resume; masked again whenever the whole bullet list is replaced
+        self.resumed_coverage = []
+        # Best matches of the utterance's realtime hints by id, until its final text settles them;
+        # replaced rather than mutated so match workers can read it without a lock
+        self.provisionals = {}
+        # Track the last transcript seen and the full transcript
+        self.transcript = StreamingTranscript()
+        self.transcript_lock = threading.Lock()
+        # Transcript and match events on disk, so the session survives a server restart
+        self.log = SessionLog.create() if SESSION_LOG_DIR else None
+        if self.log:
+            session_log_writer.claim(self.log.key)
+
+    def negotiate(self, protocol, encoding):
+        """Picks the newest protocol both sides support; returns (protocol, encoding)."""
+        supported = [version for version in PROTOCOL_VERSIONS if version <= int(protocol)]
+        self.protocol = max(supported) if supported else PROTOCOL_VERSIONS[0]
+        if self.outbox:
+            self.outbox.close()
+            self.outbox = None
+        if self.protocol >= 2:
+            self.outbox = Outbox(self.websocket, encoding if encoding in ENCODINGS else 'json')
+            return self.protocol, self.outbox.encoding
+        return self.protocol, 'json'
+
+    async def send_transcript(self, text):
+        if self.outbox:
+            self.outbox.transcript(text)
+        else:
+            await send_message(self.websocket, "transcription", {"text": text})
+
+    def settle_provisionals(self, matches):
+        """Ends the utterance: returns each provisional bullet id mapped to 'confirmed' or 'retracted'.
+
+        A hint is confirmed if the final text matches its bullet anywhere in
+        the final results, not just as the best match.
+        """
+        provisionals, self.provisionals = self.provisionals, {}
+        final_ids = {match["id"] for match in matches}
+        return {
+            bullet_id: 'confirmed' if bullet_id in final_ids else 'retracted'
+            for bullet_id in provisionals
+        }
+
+    def match_message(self, matches, final, settled=None):
+        """Builds the message for a match result, or None if the client needs nothing.
+
+        Realtime matches add to the utterance's provisional hints. Its final
+        match confirms or retracts each of them (settled, from
+        settle_provisionals); the status describes the best final match.
+        Clients before protocol 3 only hear about corrections and matches
+        the partials missed.
+        """
+        best = matches[0] if matches else None
+        if not final:
+            self.provisionals = {**self.provisionals, best["id"]: best}
+            # Keep match/score for the best hit; matches carries the ranked top-k
+            return {
+                "type": "match_provisional" if self.protocol >= 3 else "match_result",
+                "match": best["text"],
+                "score": best["score"],
+                "matches": matches,
+            }
+        settled = settled or {}
+        if best and settled:
+            status = 'confirmed' if best["id"] in settled else 'corrected'
+        elif best:
+            status = 'new'
+        elif settled:
+            status = 'retracted'
+        else:
+            return None
+        if self.protocol < 3:
+            if status in ('confirmed', 'retracted'):
+                return None
+            return {"type": "match_result", "match": best["text"], "score": best["score"], "matches": matches}
+        return {
+            "type": "match_result",
+            "match": best["text"] if best else None,
+            "score": best["score"] if best else 0.0,
+            "matches": matches,
+            "final": True,
+            "status": status,
+            "provisional": list(settled)[-1] if settled else None,
+            "confirmed": [bullet_id for bullet_id, outcome in settled.items() if outcome == 'confirmed'],
+            "retracted": [bullet_id for bullet_id, outcome in settled.items() if outcome == 'retracted'],
+        }
+
+    async def send_match(self, matches, received_at, final=False):
+        settled = self.settle_provisionals(matches) if final else None
+        message = self.match_message(matches, final, settled)
+        if self.log and (matches or final):
+            self.log.record("match", final=final, matches=[match["id"] for match in matches],
+                            score=matches[0]["score"] if matches else None,
+                            status=message.get("status") if message else None,
+                            latency_ms=(time.perf_counter() - received_at) * 1000)
+        if message is not None:
+            if self.outbox:
+                self.outbox.match(message, received_at)
+            else:
+                await send_message(self.websocket, message.pop("type"), message)
+                match_delivery_latency.record(time.perf_counter() - received_at)
+        await self.update_coverage(matches, settled)
+
+    async def update_coverage(self, matches, settled):
+        """Covers the bullet a match reported and re-arms every provisional match the final text retracted."""
+        best = matches[0]["id"] if matches else None
+        rearm = [bullet_id for bullet_id, outcome in (settled or {}).items() if outcome == 'retracted']
+        if best is None and not rearm:
+            return
+        loop = asyncio.get_running_loop()
+        # Rebuilding the candidate index can take a while on big lists; keep it off the loop
+        covered = await loop.run_in_executor(None, self.bullets.cover, [best] if best else [])
+        rearmed = await loop.run_in_executor(None, self.bullets.rearm, rearm) if rearm else []
+        if covered or rearmed:
+            if self.log:
+                self.log.record("coverage", covered=covered, rearmed=rearmed)
+            await self.send_coverage()
+
+    async def send_coverage(self):
+        if self.outbox and self.protocol >= 4 and not self.closed:
+            self.outbox.message("coverage", self.bullets.coverage())
+
+    async def feed_audio(self, pcm, received_at):
+        """Hands a frame to the recorder through the bounded buffer and tells the client about backpressure."""
+        action = self.audio_buffer.push(self.recorder, pcm, received_at)
+        if self.audio_buffer.frames and self.drain_handle is None:
+            # Keep draining when the client goes quiet or is throttled
+            self.drain_handle = asyncio.get_running_loop().call_later(0.05, self._drain_audio)
+        if action:
+            await self.send_flow_control(action)
+
+    def _drain_audio(self):
+        self.drain_handle = None
+        if self.closed or self.recorder is None:
+            return
+        buffer = self.audio_buffer
+        if buffer.drain(self.recorder):
+            self.drain_handle = asyncio.get_running_loop().call_later(0.05, self._drain_audio)
+        action = buffer.flow_control()
+        if action:
+            asyncio.get_running_loop().create_task(self.send_flow_control(action))
+
+    async def send_flow_control(self, action):
+        data = {
+            "action": action,
+            "buffered_ms": self.audio_buffer.buffered * 1000 / RECORDER_SAMPLE_RATE,
+            "lag_ms": self.audio_buffer.lag_ms(),
+        }
+        logger.info("Audio flow control for session %d: %s (lag %.0f ms)", self.id, action, data["lag_ms"])
+        if self.outbox:
+            self.outbox.message("flow_control", data)
+        else:
+            await send_message(self.websocket, "flow_control", data)
+
+    async def send_bullets_updated(self):
+        await send_message(self.websocket, "status", {
+            "status": "bullets_updated",
+            "count": len(self.bullets),
+            "index": self.bullets.index.name if self.bullets.index else None,
+        })
+
+    def precompute_bullet_embeddings(self, points, thresholds=None, index_backend=None):
+        """Precomputes embeddings for the list of bullet points and builds the search index."""
+        items = parse_bullet_items(points, thresholds)
+        if not items:
+            self.bullets.set([])
+            logger.info("Bullet points list is empty. Cleared embeddings.")
+            return
+        
+        logger.info("Precomputing embeddings for %d bullet points...", len(items))
+        start_time = time.time()
+        
         try:
-            # Stop the poll_connection thread
-            self._stop_poll = True
-            if hasattr(self, '_poll_thread') and self._poll_thread:
-                self._poll_thread.join(timeout=1.0)
-            
-            # Call the parent's shutdown method if it exists
-            if hasattr(super(), 'shutdown'):
-                super().shutdown()
+            # Normalized rows so a single matrix-vector product gives cosine scores
+            self.bullets.set(items, index_backend)
+            if self.resumed_coverage:
+                self.bullets.cover(self.resumed_coverage)
+            end_time = time.time()
+            logger.info("Precomputation finished in %.2f seconds.", end_time - start_time)
         except Exception as e:
-            logging.error(f"Error in custom shutdown: {e}")
+            self.bullets.set([])
+            logger.error("Failed to precompute bullet embeddings: %s", e)
+
+    def find_best_match(self, transcript_text, final=False):
+        """Finds the top-k matching bullet points for the given transcript.
+
+        Text is matched as sentence/phrase chunks. final marks an utterance's
+        final text, which is ranked in one pass; realtime text goes through
+        the scheduler and only its new chunks are embedded.
+        """
+        bullets = self.bullets
+        provisionals = list(self.provisionals) if final else []
+
+        if (bullets.index is None and not provisionals) or len(bullets) == 0 or not transcript_text:
+            if bullets.index is None:
+                logger.debug("No bullet embeddings available for matching.", extra=SAMPLED)
+            elif len(bullets) == 0:
+                logger.debug("No bullet points available for matching.", extra=SAMPLED)
+            elif not transcript_text:
+                logger.debug("Empty transcript text, skipping matching.", extra=SAMPLED)
+            return [], 0.0  # No match if no bullets or empty transcript
+
+        if final:
+            try:
+                started = time.perf_counter()
+                matches, score = self.chunk_matcher.settle(bullets, transcript_text, keep=provisionals)
+                pipeline_latency["match"].record(time.perf_counter() - started)
+                logger.debug("Final text: %s | best score %.4f", transcript_text, score,
+                             extra={'fields': {'session': self.id, 'score': score}})
+                return matches, score
+            except Exception as e:
+                logger.error("Error matching final text: %s", e)
+                return [], 0.0
 
-def initialize_recorder():
-    """Initialize the recorder if not already initialized"""
-    global recorder, recorder_initialized
-    
-    if not recorder_initialized:
         try:
-            recorder = CustomAudioToTextRecorder(
-                spinner=False,
-                model='tiny.en',
-                use_main_model_for_realtime=True,
-                compute_type='int8_float32',
-                language='en',
-                silero_sensitivity=0.6,
-                webrtc_sensitivity=2,
-                # How long must I hear silence before I decide your utterance is finished and kick off a final transcription?
-                post_speech_silence_duration=0.2,
-                # Once I’ve finalized one utterance, how long of continuous silence before I’ll even start listening for a new one?
-                min_gap_between_recordings=0.3,
-                # Can I get a quick, provisional transcription as soon as any silence is detected—even 
-                # before the full post_speech_silence_duration has passed?
-                # early_transcription_on_silence=50,
-                min_length_of_recording=1.5,
-                enable_realtime_transcription=True,
-                # Reduce processing pause for more frequent updates
-                realtime_processing_pause=0.02,
-                silero_deactivity_detection=False,
-                beam_size=5,
-                beam_size_realtime=1,
-                debug_mode=True,
-                no_log_file=True,
-            )
-            recorder_initialized = True
-            print("Recorder initialized successfully")
+            if self.match_scheduler.check(transcript_text, self.total_word_count) is None:
+                return [], 0.0
+            started = time.perf_counter()
+            if bullets.covered and bullets.rearm_seconds and bullets.rearm():
+                post_coverage(self)
+
+            # Only the sentence/phrase chunks this update added are embedded
+            result = self.chunk_matcher.match(bullets, transcript_text)
+            if result is None:
+                logger.debug("No new chunks in: %s", transcript_text, extra=SAMPLED)
+                return [], 0.0
+            matches, score = result
+            logger.debug("Comparing transcript: %s | best score %.4f", transcript_text, score,
+                         extra={'fields': {'session': self.id, 'score': score}})
+            self._record_match(started, score)
+            return matches, score
         except Exception as e:
-            logging.error(f"Error initializing recorder: {e}")
-            return False
-    return True
+            logger.error("Error finding best match: %s", e)
+            return [], 0.0
+
+    def _record_match(self, started, score):
+        elapsed = time.perf_counter() - started
+        pipeline_latency["match"].record(elapsed)
+        self.match_scheduler.record(elapsed, score, len(match_executor.pending))
+
+    def process_text(self, text):
+        """Recorder callback for stabilized realtime text.
+
+        RealtimeSTT starts a new thread for every callback, so updates can
+        overlap; transcript_lock keeps the diff, the counters and the order
+        texts are posted in consistent.
+        """
+        if not (self.recording and text):
+            return
+        with self.transcript_lock:
+            # Only the part of the text that changed since the last update is tokenized
+            added = self.transcript.update(text)
+
+            # If it's exactly the same once dots are removed, skip
+            if added is None:
+                logger.debug("Ignored duplicate transcript: '%s'", text, extra=SAMPLED)
+                return
+
+            # Count the appended words
+            self.total_word_count += len(added)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Transcript += '%s' (%d words)", " ".join(added), self.transcript.word_count)
+                if LOG_FULL_TRANSCRIPT:
+                    logger.debug("Full transcript: %s", self.full_transcript)
+
+            post_transcription(self, text)
+
+    def process_final_text(self, text):
+        """Recorder callback for an utterance's final text; RealtimeSTT runs it on its own thread"""
+        if self.recording and text:
+            logger.debug("Final utterance: '%s'", text)
+            if self.log:
+                # Realtime deltas include every rewrite; the final text is what a resume shows
+                self.log.append_words(text.split())
+            post_final_transcription(self, text)
+
+    @property
+    def full_transcript(self):
+        """The session transcript so far, joined on demand"""
+        return self.transcript.full_text()
+
+    async def start(self):
+        """Leases a recorder if needed and resumes its recording thread. Returns False if no recorder is available."""
+        if self.recorder is None:
+            self.recorder = await asyncio.get_event_loop().run_in_executor(None, model_pool.acquire_recorder)
+            if self.recorder is None:
+                return False
+            if self.closed:
+                model_pool.release_recorder(self.recorder)
+                self.recorder = None
+                return False
+        self.provisionals = {}
+        self.recording = True
+        self.recorder.worker.resume(self.process_text, self.process_final_text)
+        if self.log:
+            self.log.record("start", words=self.transcript.word_count)
+        return True
 
-def handle_client_disconnect(websocket):
-    """Handle client disconnection without shutting down the recorder"""
-    global recording
-    recording = False  # Ensure recording stops on disconnect
-    print(f"Client connection handling completed for {websocket.remote_address}")
+    def stop(self):
+        """Stops recording; the recorder stays leased and loaded for the next start."""
+        if self.recording and self.log:
+            self.log.record("stop", words=self.transcript.word_count)
+        self.recording = False
+        if self.recorder:
+            self.recorder.worker.pause()
+
+    async def resume(self, key):
+        """Continues a logged session: restores its stored transcript and takes over its log.
+
+        Returns (transcript, covered bullet ids), or None if there is no such
+        log, another live session owns it, or this session already has words.
+        The covered bullets are masked again as soon as the bullets are known.
+        """
+        if not self.log or not SESSION_KEY.match(str(key)) or self.transcript.word_count:
+            return None
+        loop = asyncio.get_running_loop()
+        # A previous connection's records for this key may still be queued
+        await loop.run_in_executor(None, session_log_writer.sync)
+        log = SessionLog(key)
+        if not log.exists() or not session_log_writer.claim(key):
+            return None
+        try:
+            transcript, events = await loop.run_in_executor(None, log.load)
+        except Exception as e:
+            logger.error("Could not resume session log %s: %s", key, e)
+            log.close()
+            return None
+        self.log.close()
+        self.log = log
+        with self.transcript_lock:
+            self.transcript.restore(transcript)
+            self.total_word_count += log.word_count
+        log.record("resume", words=log.word_count)
+        # Replay coverage changes so bullets re-armed before the restart stay candidates
+        covered = {}
+        for event in events:
+            if event.get("event") == "coverage":
+                covered.update(dict.fromkeys(event["covered"]))
+                for bullet_id in event["rearmed"]:
+                    covered.pop(bullet_id, None)
+        self.resumed_coverage = list(covered)
+        if len(self.bullets):
+            await loop.run_in_executor(None, self.bullets.cover, self.resumed_coverage)
+        logger.info("Resumed session %s with %d words and %d covered bullets", key, log.word_count, len(covered))
+        return transcript, self.resumed_coverage
+
+    def get_total_word_count(self):
+        """Returns the total word count for the session"""
+        return self.total_word_count
+
+    def stats(self):
+        """Returns per-session statistics for the stats command."""
+        return {
+            "id": self.id,
+            "recording": self.recording,
+            "bullets": len(self.bullets),
+            "words": self.total_word_count,
+            "scheduler": self.match_scheduler.stats(),
+            "chunks": self.chunk_matcher.stats(),
+            "coverage": self.bullets.coverage(),
+            "log": self.log.key if self.log else None,
+            "ingest": self.audio_ingest.stats(),
+            "audio_buffer": self.audio_buffer.stats(),
+            "index": self.bullets.index.stats() if self.bullets.index else None,
+        }
+
+    def close(self):
+        """Handle client disconnection: stop recording and hand shared resources back"""
+        self.closed = True
+        self.stop()
+        self.bullet_updates.cancel()
+        if self.drain_handle:
+            self.drain_handle.cancel()
+        if self.outbox:
+            self.outbox.close()
+        if self.log:
+            self.log.record("close", words=self.transcript.word_count, scheduler=self.match_scheduler.stats())
+            self.log.close()
+        match_executor.discard(self)
+        if self.recorder is not None:
+            model_pool.release_recorder(self.recorder)
+            self.recorder = None
+        logger.info("Client connection handling completed for %s", self.websocket.remote_address)
 
 async def handle_client(websocket):
     """Handle WebSocket connection with the Electron app"""
-    global recording, recorder, recorder_initialized, bullet_points, bullet_embeddings
-
-    # Ensure recorder is initialized
-    if not recorder_initialized:
-        logging.warning("Recorder not initialized before client connection.")
-        initialized = initialize_recorder()
-        if not initialized:
-            await websocket.close(1011, "Failed to initialize recorder")
-            return
-
-    # Send initial connection status
-    await send_message(websocket, "status", {"status": "connected"})
-    print("Client connected to transcription server")
+    session = Session(websocket)
+    sessions.add(session)
+
+    # Send initial connection status, advertising the audio formats we accept
+    await send_message(websocket, "status", {
+        "status": "connected",
+        "session": session.id,
+        "components": dict(component_status),
+        "audio": {"sample_rate": RECORDER_SAMPLE_RATE, "formats": list(AUDIO_FORMATS)},
+        "protocols": list(PROTOCOL_VERSIONS),
+        "encodings": list(ENCODINGS),
+    })
+    logger.info("Client connected to transcription server (%d active sessions)", len(sessions))
 
     try:
         async for message in websocket:
             # Handle binary audio data
             if isinstance(message, bytes):
-                if recording and recorder and not shutdown_in_progress:
+                if session.recording and session.recorder and not shutdown_in_progress:
                     try:
-                        # Convert bytes to float32 array expected by RealtimeSTT
-                        audio_data = np.frombuffer(message, dtype=np.int16)
-                        if len(audio_data) > 0:
-                            # Normalize to [-1, 1] float range
-                            audio_float = audio_data.astype(np.float32) / 32767.0
-                            recorder.feed_audio(audio_float.tobytes())
+                        received_at = time.perf_counter()
+                        # RealtimeSTT buffers raw 16 kHz int16 PCM bytes
+                        pcm = session.audio_ingest.ingest(message)
+                        ingested_at = time.perf_counter()
+                        pipeline_latency["frame_ingest"].record(ingested_at - received_at)
+                        if len(pcm) > 0:
+                            await session.feed_audio(pcm, received_at)
+                            pipeline_latency["feed_audio"].record(time.perf_counter() - ingested_at)
+                            logger.debug("Fed %d-byte frame for session %d", len(message), session.id, extra=SAMPLED)
+                        if session.outbox:
+                            session.outbox.audio(len(pcm) // 2)  # int16 samples fed to the recorder
 
                     except Exception as e:
-                        logging.error(f"Error processing audio data: {e}")
+                        logger.error("Error processing audio data: %s", e, extra=SAMPLED)
 
             else:
                 try:
@@ -417,31 +2920,32 @@ async def handle_client(websocket):
                     if message_type == "control":
                         command = payload.get("command")
                         if command == "start":
-                            if not recording and not shutdown_in_progress:
-                                print("Start recording command received")
-                                recording = True
-                                # Clear old transcription data if needed
-                                while not transcription_queue.empty(): transcription_queue.get()
-                                while not similarity_queue.empty(): similarity_queue.get()
-
-                                recorder.on_realtime_transcription_stabilized  = lambda text: process_text(text, websocket)
-                                # Start recorder loop in executor
-                                asyncio.get_event_loop().run_in_executor(None, start_recording_loop)
-                                await send_message(websocket, "status", {"status": "started"})
+                            if not session.recording and not shutdown_in_progress:
+                                logger.info("Start recording command received")
+                                # Don't load a second recorder while the startup one is still loading
+                                await wait_for_component('recorder')
+                                if session.outbox:
+                                    # The client clears its transcript when it starts recording
+                                    session.outbox.reset_transcript()
+                                if await session.start():
+                                    await send_message(websocket, "status", {"status": "started"})
+                                else:
+                                    await send_message(websocket, "status", {"status": "error", "error": "Failed to initialize recorder"})
 
                         elif command == "stop":
-                            if recording:
-                                print("Stop recording command received")
-                                recording = False
+                            if session.recording:
+                                logger.info("Stop recording command received")
                                 # Optionally send final transcription fragments if any
-                                recorder.on_realtime_transcription_stabilized  = None  # Detach callback
+                                session.stop()
                                 await send_message(websocket, "status", {"status": "stopped"})
 
                         elif command == "shutdown":
-                            print("Shutdown command received")
-                            # Properly shut down the recorder
+                            logger.info("Shutdown command received")
+                            # Properly shut down the recorders
                             await asyncio.get_event_loop().run_in_executor(None, shutdown_recorder)
                             await send_message(websocket, "status", {"status": "shutdown_complete"})
+                            # The server keeps running; warm a recorder again so the next client starts instantly
+                            asyncio.create_task(load_component('recorder', initialize_recorder))
                             # Close the websocket connection
                             await websocket.close(1000, "Shutdown requested by client")
 
@@ -449,12 +2953,99 @@ async def handle_client(websocket):
                             # Respond to pings to keep connection alive if needed
                             await send_message(websocket, "control", {"command": "pong"})
 
+                        elif command == "stats":
+                            await send_message(websocket, "stats", {
+                                "latency": latency_stats(),
+                                "matcher": match_executor.stats(),
+                                "models": model_pool.stats(),
+                                "query_memo": query_memo.stats() if query_memo else None,
+                                "sessions": len(sessions),
+                                "session": session.stats(),
+                                "session_log": session_log_writer.stats(),
+                                "components": dict(component_status),
+                                "startup": startup_profile.summary(),
+                            })
+
+                        elif command == "coverage":
+                            await send_message(websocket, "coverage", session.bullets.coverage())
+
+                        elif command == "index_stats":
+                            stats = session.bullets.index.stats() if session.bullets.index else None
+                            await send_message(websocket, "index_stats", {"stats": stats})
+
+                    elif message_type == "hello":
+                        # Protocol negotiation; clients that never say hello stay on protocol 1
+                        protocol, encoding = session.negotiate(
+                            payload.get("protocol", 1), payload.get("encoding", "json")
+                        )
+                        # A reconnecting client names the session it had to pick up where it left off
+                        resumed = await session.resume(payload["session"]) if payload.get("session") else None
+                        await send_message(websocket, "status", {
+                            "status": "protocol",
+                            "protocol": protocol,
+                            "encoding": encoding,
+                            "tick": OUTBOUND_TICK if session.outbox else None,
+                            "session": session.log.key if session.log else None,
+                        })
+                        if resumed:
+                            transcript, matched = resumed
+                            await send_message(websocket, "status", {
+                                "status": "resumed",
+                                "session": session.log.key,
+                                "transcript": transcript,
+                                "words": session.transcript.word_count,
+                                "matches": matched,
+                            })
+
+                    elif message_type == "audio_format":
+                        # Negotiate the sample rate and format of the binary frames that follow
+                        try:
+                            session.audio_ingest = AudioIngest(
+                                payload.get("sample_rate", RECORDER_SAMPLE_RATE),
+                                payload.get("format", "int16"),
+                            )
+                            await send_message(websocket, "status", {
+                                "status": "audio_format",
+                                "sample_rate": session.audio_ingest.sample_rate,
+                                "format": session.audio_ingest.sample_format,
+                                "passthrough": session.audio_ingest.passthrough,
+                            })
+                        except ValueError as e:
+                            await send_message(websocket, "status", {"status": "audio_format_rejected", "error": str(e)})
+
                     elif message_type == "set_bullet_points":
                         points = payload.get("points", [])
-                        print(f"Received {len(points)} bullet points from client.")
+                        thresholds = payload.get("thresholds")
+                        index_backend = payload.get("index")
+                        logger.info("Received %d bullet points from client.", len(points))
+                        if not await wait_for_component('embedding'):
+                            await send_message(websocket, "status", {"status": "error", "error": "Embedding model is not available"})
+                            continue
                         # Run blocking precomputation in executor
-                        await asyncio.get_event_loop().run_in_executor(None, precompute_bullet_embeddings, points)
-                        await send_message(websocket, "status", {"status": "bullets_updated", "count": len(bullet_points)})
+                        await asyncio.get_event_loop().run_in_executor(
+                            None, session.precompute_bullet_embeddings, points, thresholds, index_backend
+                        )
+                        await session.send_bullets_updated()
+
+                    elif message_type == "update_bullet_points":
+                        # Incremental edits by id; bursts are merged before encoding
+                        session.bullet_updates.submit(
+                            add=payload.get("add", []),
+                            remove=payload.get("remove", []),
+                            replace=payload.get("replace", []),
+                        )
+
+                    elif message_type == "rearm_bullets":
+                        # Matched bullets the client wants matched again; no ids re-arms all of them
+                        ids = payload.get("ids")
+                        rearmed = await asyncio.get_running_loop().run_in_executor(
+                            None, session.bullets.rearm, list(session.bullets.covered) if ids is None else ids
+                        )
+                        session.resumed_coverage = [
+                            bullet_id for bullet_id in session.resumed_coverage if bullet_id not in rearmed
+                        ]
+                        await send_message(websocket, "coverage", session.bullets.coverage())
+                        logger.info("Re-armed %d bullet points", len(rearmed))
 
                     else:
                         logging.warning(f"Received unknown message type: {message_type}")
@@ -465,35 +3056,16 @@ async def handle_client(websocket):
                     logging.error(f"Error processing message: {e} | Raw: {message}")
 
     except websockets.exceptions.ConnectionClosed as e:
-        print(f"Client disconnected with code {e.code}: {e.reason}")
+        logger.info("Client disconnected with code %s: %s", e.code, e.reason)
     except Exception as e:
         logging.error(f"Error handling client: {e}", exc_info=True)  # Log traceback
     finally:
-        handle_client_disconnect(websocket)
-
-def start_recording_loop():
-    """Function to run in a separate thread for continuous recording"""
-    global recording, recorder
-    
-    try:
-        # Use a dedicated thread for recording to avoid blocking
-        while recording and not shutdown_in_progress:
-            try:
-                # Call text() without the unsupported timeout parameter
-                recorder.text(lambda text: None)  # We handle real-time updates via on_realtime_transcription_stabilized 
-            except Exception as e:
-                if not shutdown_in_progress:  # Only log if not shutting down
-                    logging.error(f"Error in recording iteration: {e}")
-                time.sleep(0.1)
-    except Exception as e:
-        if not shutdown_in_progress:  # Only log if not shutting down
-            logging.error(f"Error in recording loop: {e}")
-    finally:
-        logging.debug("Recording loop ended")
+        sessions.discard(session)
+        session.close()
 
 def shutdown_recorder():
-    """Properly shut down the recorder to prevent memory leaks"""
-    global recording, recorder, recorder_initialized, shutdown_in_progress
+    """Properly shut down every recorder to prevent memory leaks"""
+    global shutdown_in_progress
     
     if shutdown_in_progress:
         return
@@ -502,38 +3074,25 @@ def shutdown_recorder():
     print("Shutting down recorder...")
     
     try:
-        # First stop recording if it's active
-        if recording:
-            recording = False
-            print("Stopped recording before shutdown")
+        # First stop recording in every session and drop their leases
+        for session in list(sessions):
+            if session.recording:
+                print(f"Stopped recording in session {session.id} before shutdown")
+            session.stop()
+            session.recorder = None
         
-        # Then properly shut down the recorder
-        if recorder and recorder_initialized:
-            try:
-                # Detach callback to prevent further callbacks during shutdown
-                recorder.on_realtime_transcription_stabilized  = None
-                
-                # Call the custom shutdown method
-                recorder.shutdown()
-                print("Recorder shutdown method called")
-                
-                # Clear the recorder instance
-                recorder = None
-                recorder_initialized = False
-                print("Recorder instance cleared")
-            except Exception as e:
-                logging.error(f"Error during recorder shutdown: {e}")
+        # Then properly shut down the recorders
+        if model_pool is not None:
+            count = model_pool.shutdown_recorders()
+            print(f"Shut down {count} recorder instance(s)")
+        # Transcripts outlive the recorders; make sure they're on disk
+        session_log_writer.sync()
     except Exception as e:
         logging.error(f"Error in shutdown_recorder: {e}")
     finally:
         shutdown_in_progress = False
         print("Recorder shutdown completed")
 
-# You can also add a function to retrieve the total word count if needed
-def get_total_word_count():
-    """Returns the total word count for the session"""
-    return total_word_count
-
 has_started = False
 
 async def main():
@@ -554,8 +3113,8 @@ async def main():
     print("Starting Transcription Server")
     print("="*50 + "\n")
 
-    start_time = time.time()
-    last_step_time = start_time
+    global startup_profile
+    startup_profile = StartupProfile()
 
     # Suppress ctranslate2 warnings
     os.environ['CT2_VERBOSE'] = '0'  # Suppress ctranslate2 logger
@@ -563,11 +3122,8 @@ async def main():
     # Suppress sentence_transformers INFO messages
     logging.getLogger('sentence_transformers').setLevel(logging.WARNING)
 
-    current_time = time.time()
-    print(f"Initial setup completed in {current_time - last_step_time:.2f} seconds")
-    last_step_time = current_time
+    startup_profile.mark("initial_setup")
 
-    print("Checking and installing required packages...")
     # Check and install required packages
     # check_and_install_packages([
     #     {'import_name': 'websockets'},
@@ -577,47 +3133,25 @@ async def main():
     #     {'import_name': 'numpy'},
     # ])
     
-    current_time = time.time()
-    print(f"Package installation completed in {current_time - last_step_time:.2f} seconds")
-    last_step_time = current_time
-    
     # Register signal handlers
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
     
-    # --- Initialize Model and Recorder ---
-    # Load sentence transformer model at startup
-    print("Loading sentence transformer model...")
-    model_loaded = load_similarity_model()
-    if not model_loaded:
-        logging.error("---CRITICAL---: Failed to load sentence similarity model. Matching will be disabled.")
-        # Decide if server should exit or run without matching
-        # sys.exit(1) # Or just continue without matching features
+    if SESSION_LOG_DIR:
+        pruned = prune_session_logs()
+        if pruned:
+            logger.info("Pruned %d old session log files", pruned)
 
-    current_time = time.time()
-    print(f"Model loading completed in {current_time - last_step_time:.2f} seconds")
-    last_step_time = current_time
-
-    # Pre-initialize the recorder
-    print("Initializing recorder...")
-    initialize_recorder()
-    if not recorder_initialized:
-         logging.error("---CRITICAL---: Failed to initialize recorder. Server cannot start.")
-         sys.exit(1)
-    # --- End Initialization ---
-
-    current_time = time.time()
-    print(f"Recorder initialization completed in {current_time - last_step_time:.2f} seconds")
-    last_step_time = current_time
+    global model_pool, match_executor, main_loop
+    model_pool = ModelPool()
+    match_executor = MatchExecutor()
+    main_loop = asyncio.get_running_loop()
 
     # Start the transcription and similarity queue processors
-    print("Starting transcription and similarity queue processors...")
     asyncio.create_task(process_transcription_queue())
     asyncio.create_task(process_similarity_queue()) # Start the new queue processor
 
-    current_time = time.time()
-    print(f"Queue processors started in {current_time - last_step_time:.2f} seconds")
-    last_step_time = current_time
+    startup_profile.mark("queue_processors")
 
     try:
         print("Starting WebSocket server...")
@@ -631,11 +3165,20 @@ async def main():
             max_queue=64  # Larger queue for messages
         )
         
-        current_time = time.time()
-        print(f"WebSocket server started in {current_time - last_step_time:.2f} seconds")
-        print(f"Total startup time: {current_time - start_time:.2f} seconds")
+        startup_profile.mark("websocket_bind")
         print("\nServer listening on ws://127.0.0.1:9876")
-        print("Ready to accept WebSocket connections")
+        metrics_server = None
+        if METRICS_PORT:
+            try:
+                metrics_server = await asyncio.start_server(serve_metrics, "127.0.0.1", METRICS_PORT)
+                print(f"Prometheus metrics on http://127.0.0.1:{METRICS_PORT}/metrics")
+            except OSError as e:
+                logger.error("Failed to start metrics endpoint on port %s: %s", METRICS_PORT, e)
+        print("Ready to accept WebSocket connections; models are loading in the background")
+
+        # --- Initialize Model and Recorder ---
+        # Both load on worker threads while clients can already connect
+        loading_task = asyncio.create_task(load_components())
         
         # On Windows, signal handlers with asyncio can cause issues
         # Just run the server indefinitely
@@ -644,11 +3187,17 @@ async def main():
         except asyncio.CancelledError:
             pass
         finally:
+            # Stop waiting on components still loading; their worker threads finish on their own
+            loading_task.cancel()
+            await asyncio.gather(loading_task, return_exceptions=True)
             server.close()
             await server.wait_closed()
+            if metrics_server:
+                metrics_server.close()
             print("Server shut down gracefully")
             # Properly shut down the recorder
             await asyncio.get_event_loop().run_in_executor(None, shutdown_recorder)
+            match_executor.shutdown()
     except OSError as e:
         # Handle the case where the port is already in use
         if e.errno == 10048:  # Windows-specific error for "Address already in use"
@@ -664,8 +3213,268 @@ async def main():
         if not shutdown_in_progress:
             await asyncio.get_event_loop().run_in_executor(None, shutdown_recorder)
 
+# --- Batch transcription ---
+BATCH_AUDIO_EXTENSIONS = ('.wav', '.mp3', '.m4a', '.flac', '.ogg', '.webm')
+BATCH_MAX_CHUNK_SECONDS = 30.0  # Whisper's window; longer speech without a pause is cut hard
+BATCH_MIN_SILENCE = 0.5  # Seconds of silence that may end a chunk
+BATCH_VAD_FRAME_MS = 30
+BATCH_VAD_AGGRESSIVENESS = 2  # Same as the recorder's webrtc_sensitivity
+
+# Whisper model loaded once in each batch worker process
+batch_model = None
+
+def load_audio_file(path):
+    """Decodes an audio file to 16 kHz mono float32 samples in [-1, 1]."""
+    if path.lower().endswith('.wav'):
+        with wave.open(path, 'rb') as wav:
+            if wav.getsampwidth() == 2:
+                rate = wav.getframerate()
+                samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype='<i2').astype(np.float32) / 32768.0
+                samples = samples.reshape(-1, wav.getnchannels()).mean(axis=1)
+                if rate != RECORDER_SAMPLE_RATE:
+                    positions = np.arange(0, len(samples), rate / RECORDER_SAMPLE_RATE)
+                    samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+                return samples
+    # Everything else goes through faster-whisper's decoder
+    from faster_whisper import decode_audio
+    return decode_audio(path, sampling_rate=RECORDER_SAMPLE_RATE)
+
+def speech_frames(samples, frame_ms=BATCH_VAD_FRAME_MS):
+    """Flags each frame as speech, using webrtcvad when available and an energy gate otherwise."""
+    frame = RECORDER_SAMPLE_RATE * frame_ms // 1000
+    count = len(samples) // frame
+    frames = samples[:count * frame].reshape(count, frame)
+    try:
+        import webrtcvad
+        vad = webrtcvad.Vad(BATCH_VAD_AGGRESSIVENESS)
+        pcm = (np.clip(frames, -1.0, 1.0) * 32767).astype('<i2')
+        return np.array([vad.is_speech(row.tobytes(), RECORDER_SAMPLE_RATE) for row in pcm], dtype=bool)
+    except ImportError:
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        return rms >= AUDIO_SILENCE_RMS / 32768.0
+
+def split_on_silence(samples, max_seconds=BATCH_MAX_CHUNK_SECONDS, min_silence=BATCH_MIN_SILENCE):
+    """Returns (start, end) sample ranges of speech, cut in the middle of pauses and at most max_seconds long."""
+    frame = RECORDER_SAMPLE_RATE * BATCH_VAD_FRAME_MS // 1000
+    speech = speech_frames(samples)
+    max_frames = int(max_seconds * 1000 / BATCH_VAD_FRAME_MS)
+    min_gap = max(1, int(min_silence * 1000 / BATCH_VAD_FRAME_MS))
+    chunks = []
+    start = None  # First frame of the chunk being built
+    last_speech = None
+    for i, is_speech in enumerate(speech):
+        if is_speech:
+            if start is None:
+                start = i
+            elif i - start >= max_frames:
+                chunks.append((start, i))
+                start = i
+            last_speech = i
+        elif start is not None and i - last_speech >= min_gap:
+            # Cut halfway into the pause so neither side loses a trailing or leading sound
+            end = last_speech + 1 + min_gap // 2
+            chunks.append((start, end))
+            start = None
+    if start is not None:
+        chunks.append((start, last_speech + 1))
+    return [(begin * frame, min(end * frame, len(samples))) for begin, end in chunks]
+
+def init_batch_worker(cpu_threads):
+    """Loads the Whisper model once per worker process."""
+    global batch_model
+    from faster_whisper import WhisperModel
+    batch_model = WhisperModel(RECORDER_MODEL, device='cpu', compute_type=RECORDER_COMPUTE_TYPE, cpu_threads=cpu_threads)
+
+def transcribe_chunk(index, offset, samples):
+    """Transcribes one chunk in a worker; segment times are made absolute with offset."""
+    segments, _ = batch_model.transcribe(samples, language='en', beam_size=RECORDER_BEAM_SIZE)
+    return index, [
+        {"start": round(offset + segment.start, 2), "end": round(offset + segment.end, 2), "text": segment.text.strip()}
+        for segment in segments
+    ]
+
+def collect_audio_files(paths):
+    """Expands directories into the audio files they contain, sorted by name."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in sorted(names)
+                             if name.lower().endswith(BATCH_AUDIO_EXTENSIONS))
+        else:
+            files.append(path)
+    return files
+
+def load_bullet_file(path):
+    """Reads bullets from a JSON list, a {"points", "thresholds"} object or one bullet per line."""
+    with open(path, encoding='utf-8') as f:
+        content = f.read()
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return parse_bullet_items([line.strip() for line in content.splitlines() if line.strip()])
+    if isinstance(data, dict):
+        return parse_bullet_items(data.get("points", []), data.get("thresholds"))
+    return parse_bullet_items(data)
+
+def bullet_coverage(segments, items):
+    """Scores every bullet against every segment in one matrix product."""
+    texts = [segment["text"] for segment in segments if segment["text"]]
+    if not items or not texts:
+        return []
+    timed = [segment for segment in segments if segment["text"]]
+    scores = encode_texts([text for _, text, _ in items]) @ encode_texts(texts).T
+    best = scores.argmax(axis=1)
+    coverage = []
+    for row, (bullet_id, text, threshold) in enumerate(items):
+        score = float(scores[row, best[row]])
+        segment = timed[best[row]]
+        coverage.append({
+            "id": bullet_id,
+            "text": text,
+            "score": score,
+            "covered": score >= (SIMILARITY_THRESHOLD if threshold is None else threshold),
+            "at": segment["start"],
+            "segment": segment["text"],
+        })
+    return coverage
+
+def run_batch(paths, bullets_path=None, workers=None, output=None):
+    """Transcribes audio files offline across a process pool and reports bullet coverage."""
+    files = collect_audio_files(paths)
+    if not files:
+        print("No audio files found")
+        return 1
+    workers = workers or os.cpu_count() or 1
+    # Split the cores between processes instead of letting every process spawn a thread per core
+    cpu_threads = max(1, (os.cpu_count() or 1) // workers)
+    items = load_bullet_file(bullets_path) if bullets_path else []
+    if items and not load_similarity_model():
+        logger.error("Embedding model failed to load; skipping bullet coverage")
+        items = []
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_batch_worker, initargs=(cpu_threads,)) as pool:
+        for path in files:
+            start_time = time.perf_counter()
+            samples = load_audio_file(path)
+            chunks = split_on_silence(samples)
+            duration = len(samples) / RECORDER_SAMPLE_RATE
+            logger.info("Transcribing %s: %.1f s of audio in %d chunks", path, duration, len(chunks))
+            futures = [
+                pool.submit(transcribe_chunk, i, begin / RECORDER_SAMPLE_RATE, samples[begin:end])
+                for i, (begin, end) in enumerate(chunks)
+            ]
+            # Stitch in chunk order regardless of which worker finished first
+            by_index = dict(future.result() for future in futures)
+            segments = [segment for i in range(len(chunks)) for segment in by_index[i]]
+            transcribed = time.perf_counter() - start_time
+            coverage = bullet_coverage(segments, items)
+            elapsed = time.perf_counter() - start_time
+            results.append({
+                "path": path,
+                "duration_s": round(duration, 2),
+                "chunks": len(chunks),
+                "transcript": " ".join(segment["text"] for segment in segments),
+                "segments": segments,
+                "coverage": coverage,
+                "covered": sum(1 for bullet in coverage if bullet["covered"]),
+                "transcribe_s": round(transcribed, 2),
+                "elapsed_s": round(elapsed, 2),
+                "realtime_factor": round(duration / elapsed, 1) if elapsed else None,
+            })
+            logger.info("Finished %s in %.1f s (%.1fx realtime)", path, elapsed, duration / elapsed if elapsed else 0.0)
+
+    report = json.dumps({"workers": workers, "files": results}, indent=2)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(report)
+        print(f"Wrote {output}")
+    else:
+        print(report)
+    return 0
+
+def parse_args():
+    """Parses command-line options; the Electron app starts the server without any"""
+    parser = argparse.ArgumentParser(description="Realtime transcription and bullet matching server")
+    parser.add_argument(
+        "--embedding-backend", choices=sorted(EMBEDDING_BACKENDS), default=EMBEDDING_BACKEND,
+        help="Embedding backend to load at startup",
+    )
+    parser.add_argument(
+        "--log-level", default=LOG_LEVEL, type=str.upper,
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Minimum level written to stdout; DEBUG adds per-update transcript and score lines",
+    )
+    parser.add_argument(
+        "--log-format", choices=["text", "json"], default=LOG_FORMAT,
+        help="Plain text lines or one JSON object per line",
+    )
+    parser.add_argument(
+        "--audio-buffer-ms", type=int, default=AUDIO_BUFFER_MS,
+        help="Audio held back for a lagging recorder before frames are dropped",
+    )
+    parser.add_argument(
+        "--audio-drop-policy", choices=AUDIO_DROP_POLICIES, default=AUDIO_DROP_POLICY,
+        help="Which frames to drop when the audio buffer is full",
+    )
+    parser.add_argument(
+        "--metrics-port", type=int, default=METRICS_PORT,
+        help="Serve pipeline latency metrics in the Prometheus text format on this local port",
+    )
+    parser.add_argument(
+        "--coverage-rearm-seconds", type=float, default=COVERAGE_REARM_SECONDS,
+        help="Let matched bullet points match again after this many seconds; 0 keeps them suppressed",
+    )
+    parser.add_argument(
+        "--no-microphone", dest="use_microphone", action="store_false",
+        help="Don't record the local microphone; only audio streamed by clients is transcribed",
+    )
+    parser.add_argument(
+        "--session-log-dir", default=SESSION_LOG_DIR,
+        help="Directory for resumable session transcript logs; an empty string disables them",
+    )
+    parser.add_argument(
+        "--transcribe", nargs="+", metavar="PATH",
+        help="Transcribe audio files or directories offline and exit instead of starting the server",
+    )
+    parser.add_argument(
+        "--bullets", metavar="FILE",
+        help="With --transcribe: bullet points to check coverage for (JSON list or one per line)",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="With --transcribe: worker processes (default: one per core)",
+    )
+    parser.add_argument(
+        "--output", metavar="FILE",
+        help="With --transcribe: write the JSON report here instead of stdout",
+    )
+    parser.add_argument(
+        "--check-embedding-parity", action="store_true",
+        help="Compare --embedding-backend against torch on sample sentences and exit",
+    )
+    # Ignore arguments added by multiprocessing in frozen builds
+    args, _ = parser.parse_known_args()
+    return args
+
 if __name__ == "__main__":
     multiprocessing.freeze_support()
+    args = parse_args()
+    EMBEDDING_BACKEND = args.embedding_backend
+    METRICS_PORT = args.metrics_port
+    AUDIO_BUFFER_MS = args.audio_buffer_ms
+    AUDIO_DROP_POLICY = args.audio_drop_policy
+    SESSION_LOG_DIR = args.session_log_dir
+    COVERAGE_REARM_SECONDS = args.coverage_rearm_seconds
+    RECORDER_USE_MICROPHONE = args.use_microphone
+    setup_logging(args.log_level, args.log_format)
+    if args.check_embedding_parity:
+        report = check_embedding_parity(EMBEDDING_BACKEND)
+        print(json.dumps(report, indent=2))
+        sys.exit(0 if report["passed"] else 1)
+    if args.transcribe:
+        sys.exit(run_batch(args.transcribe, args.bullets, args.workers, args.output))
     
     # Explicitly set start method if needed (spawn is default & usually required on Windows/macOS for frozen apps)
     if sys.platform in ['win32', 'darwin']:
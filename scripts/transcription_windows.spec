@@ -13,7 +13,7 @@ a = Analysis(
         ('venv/Lib/site-packages/faster_whisper/assets/silero_encoder_v5.onnx', 'faster_whisper/assets'),
         ('venv/Lib/site-packages/faster_whisper/assets/silero_decoder_v5.onnx', 'faster_whisper/assets')
     ],
-    hiddenimports=['pkg_resources.py2_warn'],
+    hiddenimports=['pkg_resources.py2_warn', 'optimum.onnxruntime'],
     hookspath=['./hooks'],
     hooksconfig={},
     runtime_hooks=[],
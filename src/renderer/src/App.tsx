@@ -99,6 +99,7 @@ function App(): JSX.Element {
 
   const {
     transcriptText,
+    provisionalMatch,
     wsStatus,
     wsError,
     connectWebSocket,
@@ -440,6 +441,7 @@ function App(): JSX.Element {
                 startCapture={startCombinedCapture}
                 stopCapture={stopCombinedCapture}
                 bulletPoints={bulletPoints}
+                provisionalMatch={provisionalMatch}
                 readingMode={readingMode}
                 onShowReadingModeModal={() => setShowReadingModeModal(true)}
                 desktopAudioStatus={desktopAudioStatus}
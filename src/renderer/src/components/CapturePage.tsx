@@ -24,6 +24,7 @@ interface CapturePageProps {
   startCapture: () => void
   stopCapture: () => void
   bulletPoints: string[]
+  provisionalMatch: string | null
   currentBulletPoint: string
   readingMode: 'normal' | 'rapid' | 'spritz'
   onShowReadingModeModal: () => void
@@ -54,6 +55,7 @@ export const CapturePage: React.FC<CapturePageProps> = ({
   startCapture,
   stopCapture,
   bulletPoints,
+  provisionalMatch,
   currentBulletPoint,
   readingMode,
   onShowReadingModeModal,
@@ -249,6 +251,7 @@ export const CapturePage: React.FC<CapturePageProps> = ({
         <ResponseOutput
           isCapturing={isCapturing}
           bulletPoints={bulletPoints}
+          provisionalMatch={provisionalMatch}
           currentBulletPoint={currentBulletPoint}
           readingMode={readingMode}
           commandKey={commandKey}
@@ -16,6 +16,7 @@ interface EyeContactBoxProps {
   leftOffset?: number
   spritzSize?: number
   fontSize?: string
+  dimmed?: boolean
 }
 
 export const EyeContactBox: React.FC<EyeContactBoxProps> = ({
@@ -26,7 +27,8 @@ export const EyeContactBox: React.FC<EyeContactBoxProps> = ({
   draggable = false,
   leftOffset = 0,
   spritzSize = 2,
-  fontSize = '16px'
+  fontSize = '16px',
+  dimmed = false
 }) => {
   const [boxWidth, setBoxWidth] = useState<string>(width)
   const [boxId] = useState(() => `eye-contact-box-${Math.random().toString(36).substr(2, 9)}`)
@@ -108,7 +110,9 @@ export const EyeContactBox: React.FC<EyeContactBoxProps> = ({
         pt: 1.5,
         pb: 1.5,
         bgcolor: 'rgba(16, 185, 129, 0.1)',
-        position: 'relative'
+        position: 'relative',
+        opacity: dimmed ? 0.5 : 1,
+        transition: 'opacity 0.2s ease'
       }}
     >
       <legend
@@ -10,6 +10,8 @@ type ReadingMode = 'normal' | 'rapid' | 'spritz'
 interface ResponseOutputProps {
   isCapturing: boolean
   bulletPoints: string[]
+  // Bullet the speaker seems to be covering; dimmed until the transcription server confirms it
+  provisionalMatch: string | null
   currentBulletPoint: string
   readingMode: ReadingMode
   commandKey: string
@@ -20,6 +22,7 @@ interface ResponseOutputProps {
 export const ResponseOutput: React.FC<ResponseOutputProps> = ({
   isCapturing,
   bulletPoints,
+  provisionalMatch,
   currentBulletPoint,
   readingMode,
   commandKey,
@@ -76,6 +79,7 @@ export const ResponseOutput: React.FC<ResponseOutputProps> = ({
                     'Adjust text size using the slider and box size using the edges. The smaller the reading area the less your eyes have to move to read.'
               }
               mode={readingMode}
+              dimmed={!!bulletPoints[0] && bulletPoints[0] === provisionalMatch}
               draggable={true}
               leftOffset={155}
               width="450px"
@@ -204,7 +208,9 @@ export const ResponseOutput: React.FC<ResponseOutputProps> = ({
                 sx={{
                   borderBottom: '1px solid rgba(255, 255, 255, 0.1)',
                   px: 2,
-                  py: 1
+                  py: 1,
+                  opacity: point === provisionalMatch ? 0.5 : 1,
+                  transition: 'opacity 0.2s ease'
                 }}
               >
                 <ListItemText primary={point} />
@@ -1,7 +1,26 @@
 import { useState, useRef, useEffect } from 'react'
 
+// Newest server protocol this client understands: 2 adds batched transcript deltas,
+// 3 adds provisional matches that the final utterance text confirms or corrects,
+// 4 adds coverage progress as bullets get matched
+const PROTOCOL_VERSION = 4
+
 export type WsStatus = 'disconnected' | 'connecting' | 'connected'
 
+// Bullets are identified by a hash of their text, so an id stays the same when other
+// bullets are removed and across reconnects, and the server only re-embeds real changes
+const bulletId = (text: string): string => {
+  let hash = 0x811c9dc5
+  for (let i = 0; i < text.length; i++) {
+    hash ^= text.charCodeAt(i)
+    hash = Math.imul(hash, 0x01000193)
+  }
+  return (hash >>> 0).toString(36)
+}
+
+const bulletItems = (points: string[]): Map<string, string> =>
+  new Map(points.map((text) => [bulletId(text), text]))
+
 interface UseTranscriptionServiceProps {
   isCapturing: boolean
   onTranscriptionUpdate?: (text: string) => void
@@ -11,6 +30,8 @@ interface UseTranscriptionServiceProps {
 
 interface UseTranscriptionServiceResult {
   transcriptText: string
+  // Bullet the current utterance provisionally matched; only removed once the final text confirms it
+  provisionalMatch: string | null
   wsStatus: WsStatus
   wsError: string | null
   connectWebSocket: () => void
@@ -26,6 +47,7 @@ export const useTranscriptionService = ({
   bulletPoints
 }: UseTranscriptionServiceProps): UseTranscriptionServiceResult => {
   const [transcriptText, setTranscriptText] = useState<string>('')
+  const [provisionalMatch, setProvisionalMatch] = useState<string | null>(null)
   const [wsStatus, setWsStatus] = useState<WsStatus>('disconnected')
   const [wsError, setWsError] = useState<string | null>(null)
 
@@ -36,6 +58,14 @@ export const useTranscriptionService = ({
   const pendingUpdatesRef = useRef<string[]>([])
   const processingUpdatesRef = useRef(false)
   const bulletPointsRef = useRef<string[]>(bulletPoints)
+  // Id -> text of the bullets the server has, so edits can be sent as id-based diffs
+  const lastSentBulletsRef = useRef<Map<string, string> | null>(null)
+  // Transcript the server's protocol 2 deltas apply to
+  const transcriptRef = useRef<string>('')
+  // Server session key, sent again after a reconnect so a restarted server can resume the session
+  const sessionKeyRef = useRef<string | null>(null)
+  // Transcript the server restored when it resumed the session, shown ahead of the live text
+  const resumedTextRef = useRef<string>('')
 
   // Update bullet points ref when they change
   useEffect(() => {
@@ -69,6 +99,9 @@ export const useTranscriptionService = ({
     }, 10) // Small delay for React to render
   }
 
+  const withResumedText = (text: string) =>
+    resumedTextRef.current ? `${resumedTextRef.current} ${text}`.trim() : text
+
   const queueTranscriptionUpdate = (text: string) => {
     pendingUpdatesRef.current.push(text)
     if (!processingUpdatesRef.current) {
@@ -87,6 +120,95 @@ export const useTranscriptionService = ({
     return () => clearTimeout(timer)
   }
 
+  const handleServerMessage = (data: any): void => {
+    switch (data.type) {
+      case 'transcription':
+        // Queue transcription update
+        transcriptRef.current = data.text
+        queueTranscriptionUpdate(withResumedText(data.text))
+        break
+      case 'transcript_delta':
+        // Keep the first offset characters and append the new text
+        transcriptRef.current = transcriptRef.current.slice(0, data.offset) + data.text
+        queueTranscriptionUpdate(withResumedText(transcriptRef.current))
+        break
+      case 'batch':
+        // Protocol 2 sends every message from one server tick in a single frame
+        data.messages.forEach(handleServerMessage)
+        break
+      case 'audio_ack':
+        break
+      case 'flow_control':
+        // The server is holding back audio for a lagging recognizer
+        console.warn(
+          `Transcription server asked to ${data.action} (lag ${Math.round(data.lag_ms)} ms)`
+        )
+        break
+      case 'match_provisional':
+        // Realtime hint; shown while the speaker is still talking, but nothing is removed until
+        // the utterance's final text settles it
+        if (data.match) {
+          console.log(`💭 Provisional match: '${data.match}' (Score: ${data.score.toFixed(2)})`)
+          setProvisionalMatch(bulletText(data.matches?.[0]?.id) ?? data.match)
+        }
+        break
+      case 'match_result':
+        if (data.final) {
+          settleFinalMatch(data)
+          break
+        }
+        // Servers before protocol 3 only send matches that should be acted on right away
+        if (data.match && onMatchFound) {
+          console.log(
+            `🎯 Match found from backend: '${data.match}' (Score: ${data.score.toFixed(2)})`
+          )
+          // Use the match handler if provided
+          onMatchFound(bulletText(data.matches?.[0]?.id) ?? data.match)
+        } else {
+          console.log(
+            `No match found from backend (Score: ${data.score?.toFixed(2) || 'unknown'})`
+          )
+        }
+        break
+      case 'coverage':
+        // Matched bullets are no longer candidates on the server, so they won't fire again
+        console.log(`Coverage: ${data.count}/${data.total} bullet points matched`)
+        break
+      case 'status':
+        console.log(`Received status update: ${data.status}`, data)
+        if (data.status === 'connected') {
+          isDisconnectedRef.current = false
+          setWsStatus('connected')
+          setWsError(null)
+        } else if (data.status === 'bullets_updated') {
+          console.log(`Backend confirmed ${data.count} bullet points updated.`)
+        } else if (data.status === 'protocol') {
+          console.log(`Backend protocol ${data.protocol} (${data.encoding})`)
+          if (data.session !== sessionKeyRef.current) {
+            // A new server session; anything restored for the previous one no longer applies
+            resumedTextRef.current = ''
+          }
+          sessionKeyRef.current = data.session ?? null
+        } else if (data.status === 'resumed') {
+          console.log(`Backend resumed session ${data.session} (${data.words} words)`)
+          resumedTextRef.current = data.transcript
+          queueTranscriptionUpdate(withResumedText(transcriptRef.current))
+        } else if (data.status === 'started') {
+          console.log('Backend confirmed recording started.')
+        } else if (data.status === 'stopped') {
+          console.log('Backend confirmed recording stopped.')
+        }
+        break
+      case 'control':
+        if (data.payload?.command === 'pong') {
+          console.log('Received pong from transcription server')
+        }
+        break
+      default:
+        console.warn('Received unknown message type from backend:', data.type)
+    }
+  }
+
   const connectWebSocket = () => {
     if (isConnectingRef.current || wsRef.current) return
 
@@ -106,6 +228,19 @@ export const useTranscriptionService = ({
         isDisconnectedRef.current = false
         setWsStatus('connected')
         setWsError(null)
+        transcriptRef.current = ''
+
+        // Ask for transcript deltas batched per tick; older servers ignore this and keep protocol 1
+        wsRef.current?.send(
+          JSON.stringify({
+            type: 'hello',
+            payload: {
+              protocol: PROTOCOL_VERSION,
+              encoding: 'json',
+              session: sessionKeyRef.current
+            }
+          })
+        )
 
         // If we're supposed to be capturing, start recording
         if (isCapturing) {
@@ -119,6 +254,8 @@ export const useTranscriptionService = ({
         setStatusDisconnected()
         isConnectingRef.current = false
         wsRef.current = null
+        lastSentBulletsRef.current = null
+        setProvisionalMatch(null)
 
         // Only show error if we're supposed to be connected
         if (isCapturing) {
@@ -138,50 +275,10 @@ export const useTranscriptionService = ({
       }
 
       wsRef.current.onmessage = (event) => {
+        // Only the binary protocol 2 encoding sends binary frames, and we negotiate JSON
+        if (typeof event.data !== 'string') return
         try {
-          const data = JSON.parse(event.data)
-
-          switch (data.type) {
-            case 'transcription':
-              // Queue transcription update
-              queueTranscriptionUpdate(data.text)
-              break
-            case 'match_result':
-              // Handle match result from backend
-              if (data.match && onMatchFound) {
-                console.log(
-                  `🎯 Match found from backend: '${data.match}' (Score: ${data.score.toFixed(2)})`
-                )
-                // Use the match handler if provided
-                onMatchFound(data.match)
-              } else {
-                console.log(
-                  `No match found from backend (Score: ${data.score?.toFixed(2) || 'unknown'})`
-                )
-              }
-              break
-            case 'status':
-              console.log(`Received status update: ${data.status}`, data)
-              if (data.status === 'connected') {
-                isDisconnectedRef.current = false
-                setWsStatus('connected')
-                setWsError(null)
-              } else if (data.status === 'bullets_updated') {
-                console.log(`Backend confirmed ${data.count} bullet points updated.`)
-              } else if (data.status === 'started') {
-                console.log('Backend confirmed recording started.')
-              } else if (data.status === 'stopped') {
-                console.log('Backend confirmed recording stopped.')
-              }
-              break
-            case 'control':
-              if (data.payload?.command === 'pong') {
-                console.log('Received pong from transcription server')
-              }
-              break
-            default:
-              console.warn('Received unknown message type from backend:', data.type)
-          }
+          handleServerMessage(JSON.parse(event.data))
         } catch (err) {
           console.error('Error handling WebSocket message:', err, event.data)
         }
@@ -202,16 +299,72 @@ export const useTranscriptionService = ({
     }
   }
 
+  // Text of a bullet the server reported by id
+  const bulletText = (id?: string): string | undefined =>
+    id === undefined ? undefined : lastSentBulletsRef.current?.get(id)
+
+  // Removes the bullets an utterance's final text confirmed, plus its best match when that
+  // corrects the hints or finds a missed bullet; retracted hints were never removed
+  const settleFinalMatch = (data: any) => {
+    setProvisionalMatch(null)
+    console.log(
+      `Final pass ${data.status}: confirmed [${data.confirmed ?? []}], retracted [${data.retracted ?? []}]`
+    )
+    if (!onMatchFound) return
+    const ids: string[] = [...(data.confirmed ?? [])]
+    const best = data.matches?.[0]?.id
+    if ((data.status === 'corrected' || data.status === 'new') && best !== undefined) {
+      ids.push(best)
+    }
+    const texts = new Set(ids.map(bulletText).filter((text): text is string => !!text))
+    if (texts.size === 0 && data.status !== 'retracted' && data.match) {
+      texts.add(data.match)
+    }
+    texts.forEach((text) => {
+      console.log(`🎯 Match settled by backend: '${text}'`)
+      onMatchFound(text)
+    })
+  }
+
   const sendBulletPoints = (points: string[]) => {
     if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN && points.length > 0) {
       console.log('🔄 Sending updated bullet points to backend:', points)
+      const items = bulletItems(points)
       wsRef.current.send(
         JSON.stringify({
           type: 'set_bullet_points',
-          payload: { points: points }
+          payload: { points: Array.from(items, ([id, text]) => ({ id, text })) }
         })
       )
+      lastSentBulletsRef.current = items
+    }
+  }
+
+  // Ids come from the text, so a change is always a remove plus an add and a match
+  // only sends the bullet it removed
+  const sendBulletPointUpdate = (points: string[]) => {
+    const previous = lastSentBulletsRef.current
+    if (!previous) {
+      sendBulletPoints(points)
+      return
     }
+    if (!wsRef.current || wsRef.current.readyState !== WebSocket.OPEN) return
+
+    const items = bulletItems(points)
+    const add: { id: string; text: string }[] = []
+    items.forEach((text, id) => {
+      if (!previous.has(id)) add.push({ id, text })
+    })
+    const remove = Array.from(previous.keys()).filter((id) => !items.has(id))
+    if (add.length === 0 && remove.length === 0) return
+
+    wsRef.current.send(
+      JSON.stringify({
+        type: 'update_bullet_points',
+        payload: { add, remove }
+      })
+    )
+    lastSentBulletsRef.current = items
   }
 
   const startRecording = () => {
@@ -227,7 +380,9 @@ export const useTranscriptionService = ({
 
     if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
       setWsError(null)
-      setTranscriptText('')
+      // A resumed session keeps showing the transcript the server restored
+      setTranscriptText(resumedTextRef.current)
+      transcriptRef.current = ''
       pendingUpdatesRef.current = []
 
       // Send current bullet points right before starting recording
@@ -289,12 +444,13 @@ export const useTranscriptionService = ({
   // Effect to send bullet points to the backend when they change
   useEffect(() => {
     if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN && bulletPoints.length > 0) {
-      sendBulletPoints(bulletPoints)
+      sendBulletPointUpdate(bulletPoints)
     }
   }, [bulletPoints])
 
   return {
     transcriptText,
+    provisionalMatch,
     wsStatus,
     wsError,
     connectWebSocket,
@@ -70,11 +70,14 @@ export const useWebRTC = ({
 
     // Add manual delay
     // await new Promise((resolve) => setTimeout(resolve, MANUAL_DELAY))
-    // Directly remove the bullet point at index 0
-    const removedPoint = currentBulletPoints[0]
-    setDeletedBulletPoints((prev) => [...prev, removedPoint])
-    setBulletPoints((prev) => prev.slice(1))
-    console.log('✅ Removed bullet point at index 0:', removedPoint)
+    // The server ranks every bullet, so remove the one it matched rather than the first
+    if (!currentBulletPoints.includes(matchedPoint)) {
+      console.log('🤷 Matched bullet point is no longer in the list:', matchedPoint)
+      return
+    }
+    setDeletedBulletPoints((prev) => [...prev, matchedPoint])
+    setBulletPoints((prev) => prev.filter((point) => point !== matchedPoint))
+    console.log('✅ Removed matched bullet point:', matchedPoint)
   }
 
   const connectToOpenAI = async (stream: MediaStream): Promise<void> => {